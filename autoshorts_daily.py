@@ -1,13 +1,46 @@
 # autoshorts_daily.py — Topic-locked Gemini • Per-video search_terms • Robust Pexels
 # Captions kapalıyken her sahnede bilgi kartı (drawtext) • Sessizlik kırpma + acrossfade
 # -*- coding: utf-8 -*-
-import os, sys, re, json, time, random, datetime, tempfile, pathlib, subprocess, hashlib, math, shutil
+import os, sys, re, json, time, random, pathlib, subprocess, atexit, base64, struct, heapq, functools
 from typing import List, Optional, Tuple, Dict, Any, Set
+from collections import OrderedDict, Counter
+
+# ---- precompiled regexes (sıcak yollarda tekrar tekrar kullanılıyor) ----
+_RE_TOKEN       = re.compile(r"[a-z0-9]{3,}")
+_RE_TOKEN4      = re.compile(r"[a-z0-9]{4,}")
+_RE_LANG2       = re.compile(r"([A-Za-z]{2})")
+_RE_ENTKEY      = re.compile(r"[^a-z0-9]+")
+_RE_TERMSPLIT   = re.compile(r"\s*,\s*")
+_RE_QUOTES      = re.compile(r'^[\'"]|[\'"]$')
+_RE_WS          = re.compile(r"\s+")
+_RE_KW_NONALPHA = re.compile(r"[^A-Za-zçğıöşüÇĞİÖŞÜ0-9 ]+")
+_RE_PROPER      = re.compile(r"(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)")
+_RE_LEAD_ART    = re.compile(r"^(The|A|An)\s+")
+_RE_NONALNUM_SPC = re.compile(r"[^A-Za-z0-9 ]+")
+_RE_NONALNUM_LC = re.compile(r"[^a-z0-9 ]+")
+_RE_NONALNUM_RUN = re.compile(r"[^A-Za-z0-9]+")
+_RE_ALNUM       = re.compile(r"[a-z0-9]+")
+_RE_LET3        = re.compile(r"[A-Za-z]{3,}")
+_RE_ENDPUNCT    = re.compile(r"[.!?]$")
+_RE_END_QEX     = re.compile(r"[?!]$")
+_RE_HEXCOLOR    = re.compile(r"0x[0-9A-Fa-f]{6}")
+_RE_SCENE_TAG   = re.compile(r"(?i)\bscene\s+\d+\b[:\-]?\s*")
+_RE_SENT_SPLIT  = re.compile(r"[.!?]")
+_RE_JSON_OBJ    = re.compile(r"\{.*\}", re.DOTALL)  # (?:.|\n)* ile aynı eşleşme, alternation geri izlemesi yok
+_RE_JSON_FENCE  = re.compile(r"^```json\s*|\s*```$", re.MULTILINE)
+
+# tek geçişte karakter eşleme (str.translate) — zincirleme .replace / tek karakterlik re.sub yerine
+_SMART_PUNCT     = {"—": "-", "–": "-", "“": '"', "”": '"', "’": "'"}
+_SENTENCE_TRANS  = str.maketrans({**_SMART_PUNCT, "\u200B": None, "\u200C": None, "\u200D": None, "\uFEFF": None})
+_CAPTION_TRANS   = str.maketrans({**_SMART_PUNCT, "`": None})
+
+# Ortam değişkenlerinin tek seferlik kopyası; import-time config okumaları buradan yapılır.
+_ENV = dict(os.environ)
 
 # ==== LONGFORM/ASPECT SWITCH (minimal invasive) ======================================
 # Defaults keep old shorts behavior (9:16). Set ASPECT=16:9 and LONGFORM=1 for 3–5 min.
-ASPECT_RAW = (os.getenv("ASPECT", "9:16") or "9:16").strip().lower()
-LONGFORM   = (os.getenv("LONGFORM", os.getenv("LONGFORM_ENABLE", "0")) == "1")
+ASPECT_RAW = (_ENV.get("ASPECT", "9:16") or "9:16").strip().lower()
+LONGFORM   = (_ENV.get("LONGFORM", _ENV.get("LONGFORM_ENABLE", "0")) == "1")
 if ASPECT_RAW in {"16:9", "landscape", "widescreen"}:
     VIDEO_W, VIDEO_H = 1920, 1080
     PEXELS_ORIENT = "landscape"
@@ -16,225 +49,341 @@ else:
     PEXELS_ORIENT = "portrait"
 
 # ---- focus-entity cooldown (stronger anti-repeat) ----
-ENTITY_COOLDOWN_DAYS = int(os.getenv("ENTITY_COOLDOWN_DAYS", os.getenv("NOVELTY_WINDOW", "30")))
+ENTITY_COOLDOWN_DAYS = int(_ENV.get("ENTITY_COOLDOWN_DAYS", _ENV.get("NOVELTY_WINDOW", "30")))
 
-_GENERIC_SKIP = {
+_GENERIC_SKIP = frozenset({
     "country","countries","people","history","stories","story","facts","fact","amazing","weird","random","culture","cultural",
     "animal","animals","nature","wild","pattern","patterns","science","eco","habit","habits","waste","tip","tips","daily","news",
     "world","today","minute","short","video","watch","more","better","twist","comment","voice","narration","hook","topic",
     "secret","secrets","unknown","things","life","lived","modern","time","times","explained","guide","quick","fix","fixes"
-}
+})
+
+# tokenizasyon önbellekli: aynı metinler novelty retry'ları, entity türetme ve kayıt adımlarında tekrar geçer.
+# Paylaşılan sonuç değiştirilemez (tuple).
+@functools.lru_cache(maxsize=2048)
+def _tok_words_loose(s: str) -> Tuple[str, ...]:
+    return tuple(_RE_TOKEN.findall((s or "").lower()))
 
-def _tok_words_loose(s: str) -> List[str]:
-    s = re.sub(r"[^a-z0-9 ]+", " ", (s or "").lower())
-    return [w for w in s.split() if len(w) >= 3]
+# aynı (konu, cümleler) için hem novelty döngüsünde hem kayıt sırasında çağrılıyor → sonuç bir kez hesaplanır
+_FOCUS_MEMO: Dict[Tuple[str, Tuple[str, ...]], str] = {}
 
 def _derive_focus_entity(topic: str, mode: str, sentences: list[str]) -> str:
+    memo_key = (topic or "", tuple(sentences or ()))
+    hit = _FOCUS_MEMO.get(memo_key)
+    if hit is not None:
+        return hit
     txt = " ".join(sentences or []) + " " + (topic or "")
-    words = _tok_words_loose(txt)
-    from collections import Counter as _C
-    cnt = _C([w for w in words if w not in _GENERIC_SKIP])
-    if not cnt:
-        return ""
-    bigrams = _C([" ".join(words[i:i+2]) for i in range(len(words)-1)])
-    for bg,_ in bigrams.most_common(10):
-        if all(w not in _GENERIC_SKIP for w in bg.split()) and len(bg) >= 7:
-            parts = [w for w in bg.split() if w not in _GENERIC_SKIP]
-            if parts:
-                return parts[-1]
-    for w,_ in cnt.most_common(20):
-        if len(w) >= 4:
-            return w
-    return next(iter(cnt.keys())) if cnt else ""
+    # generic kelimeler None olur → bigram zincirini keser; sayım Counter'ın C döngüsünde
+    ws = [None if w in _GENERIC_SKIP else w for w in _tok_words_loose(txt)]
+    uni = Counter(filter(None, ws))
+    bi = Counter(zip(ws, ws[1:]))  # tuple anahtar: bigram başına string birleştirme yok
+    ent = ""
+    if uni:
+        # len("a b") >= 7  ⇔  len(a) + len(b) >= 6
+        bg = max(((k, c) for k, c in bi.items() if k[0] and k[1] and len(k[0]) + len(k[1]) >= 6),
+                 key=lambda kv: kv[1], default=None)
+        if bg:
+            ent = bg[0][1]
+        else:
+            w4 = max(((w, c) for w, c in uni.items() if len(w) >= 4), key=lambda kv: kv[1], default=None)
+            ent = w4[0] if w4 else next(iter(uni))
+    if len(_FOCUS_MEMO) >= 64: _FOCUS_MEMO.clear()
+    _FOCUS_MEMO[memo_key] = ent
+    return ent
+
+# ASCII dışı karakterler regex yoluna düşer; ASCII için translate çok daha hızlı.
+_ENTKEY_TBL = {i: "-" for i in range(128) if not (48 <= i <= 57 or 97 <= i <= 122)}
 
 def _entity_key(mode: str, ent: str) -> str:
-    ent = re.sub(r"[^a-z0-9]+","-", (ent or "").lower()).strip("-")
+    ent = (ent or "").lower()
+    if ent.isascii():
+        ent = "-".join(filter(None, ent.translate(_ENTKEY_TBL).split("-")))
+    else:
+        ent = _RE_ENTKEY.sub("-", ent).strip("-")
     mode = (mode or "").lower()
     return f"{mode}:{ent}" if ent else ""
 
-def _entities_state_load() -> dict:
+ENTITIES_MAX = 10000
+_COOLDOWN_SEC = max(0, ENTITY_COOLDOWN_DAYS) * 86400
+
+# zaman damgaları tam saniye (int) saklanır; eski float kayıtlar yüklenirken çevrilir
+def _ts_or_zero(v) -> int:
     try:
-        gst = _global_topics_load()
+        return int(float(v))
     except Exception:
-        gst = {}
-    ents = (gst.get("entities") if isinstance(gst, dict) else None) or {}
-    if not isinstance(ents, dict): ents = {}
+        return 0
+
+# entities: global state içinde (_GLOBAL, _StateCache) tutulur; bellekte güncellenir, çıkışta bir kez yazılır
+def _entities_state_load() -> "OrderedDict[str, int]":
+    gst = _GLOBAL.get()
+    ents = gst.get("entities")
+    if isinstance(ents, OrderedDict):
+        return ents
+    raw = ents if isinstance(ents, dict) else {}
+    # dokunma sırasına göre (en eski başta) tutulur → budama O(1)
+    ents = OrderedDict(sorted(((k, _ts_or_zero(v)) for k, v in raw.items()), key=lambda kv: kv[1]))
+    while len(ents) > ENTITIES_MAX:
+        ents.popitem(last=False)
+    gst["entities"] = ents
     return ents
 
-def _entities_state_save(ents: dict):
-    try:
-        gst = _global_topics_load()
-    except Exception:
-        gst = {}
-    if isinstance(gst, dict):
-        gst["entities"] = ents
-        if len(ents) > 12000:
-            oldest = sorted(ents.items(), key=lambda kv: kv[1])[:2000]
-            for k,_ in oldest: ents.pop(k, None)
-            gst["entities"] = ents
-        _global_topics_save(gst)
-
-def _entity_in_cooldown(key: str, days: int) -> bool:
-    if not key or days <= 0:
-        return False
-    ents = _entities_state_load()
-    ts = ents.get(key)
-    if not ts:
-        return False
-    try:
-        age = time.time() - float(ts)
-    except Exception:
+def _entities_state_invalidate():
+    """Global state dosyası süreç dışında değiştirildiyse çağrılır; entity'ler bir sonraki erişimde yeniden yüklenir."""
+    _GLOBAL.invalidate()
+
+def _entity_in_cooldown(key: str, days: Optional[int] = None) -> bool:
+    window = _COOLDOWN_SEC if days is None else days * 86400
+    if window <= 0 or not key:
         return False
-    return age < days * 86400
+    ts = _entities_state_load().get(key)  # load sırasında int'e çevrildi
+    return bool(ts) and (time.time() - ts) < window
 
-def _entity_touch(key: str):
+def _entity_touch(key: str, now: Optional[float] = None):
     if not key:
         return
     ents = _entities_state_load()
-    ents[key] = time.time()
-    _entities_state_save(ents)
+    ents[key] = int(now if now is not None else time.time())
+    ents.move_to_end(key)
+    while len(ents) > ENTITIES_MAX:
+        ents.popitem(last=False)
+    _GLOBAL.mark_dirty()
 
 # ---------- helpers (ÖNCE gelmeli) ----------
+# _ENV bir anlık görüntü → aynı (isim, varsayılan) için sonuç değişmez; tekrar çağrılar sözlük isabeti
+@functools.lru_cache(maxsize=256)
 def _env_int(name: str, default: int) -> int:
-    s = os.getenv(name)
-    if s is None: return default
-    s = str(s).strip()
-    if s == "" or s.lower() == "none": return default
+    v = _ENV.get(name)
+    if not v: return default
     try:
-        return int(s)
+        return int(v)
     except ValueError:
         try:
-            return int(float(s))
+            return int(float(v))
         except Exception:
             return default
 
+@functools.lru_cache(maxsize=256)
 def _env_float(name: str, default: float) -> float:
-    s = os.getenv(name)
-    if s is None: return default
-    s = str(s).strip()
-    if s == "" or s.lower() == "none": return default
+    v = _ENV.get(name)
+    if not v: return default
     try:
-        return float(s)
-    except Exception:
+        return float(v)
+    except ValueError:
         return default
 
+@functools.lru_cache(maxsize=64)
 def _sanitize_lang(val: Optional[str]) -> str:
     val = (val or "").strip()
     if not val: return "en"
-    m = re.match(r"([A-Za-z]{2})", val)
+    m = _RE_LANG2.match(val)
     return (m.group(1).lower() if m else "en")
 
+_PRIVACY_OK = frozenset({"public", "unlisted", "private"})
+
+@functools.lru_cache(maxsize=64)
 def _sanitize_privacy(val: Optional[str]) -> str:
     v = (val or "").strip().lower()
-    return v if v in {"public", "unlisted", "private"} else "public"
+    return v if v in _PRIVACY_OK else "public"
+
+KARAOKE_OFFSET_MS = int(_ENV.get("KARAOKE_OFFSET_MS", "0"))
+KARAOKE_SPEED = float(_ENV.get("KARAOKE_SPEED", "1.0"))
 
-KARAOKE_OFFSET_MS = int(os.getenv("KARAOKE_OFFSET_MS", "0"))
-KARAOKE_SPEED = float(os.getenv("KARAOKE_SPEED", "1.0"))
+# sabitler import'ta bir kez hesaplanır → kelime başına tek toplama + tek çarpma
+_ADJ_OFFSET   = KARAOKE_OFFSET_MS / 1000.0
+_ADJ_INVSPEED = 1.0 / max(KARAOKE_SPEED, 1e-6)
 
 def _adj_time(t_seconds: float) -> float:
-    return max(0.0, (t_seconds + KARAOKE_OFFSET_MS / 1000.0) / max(KARAOKE_SPEED, 1e-6))
+    t = t_seconds + _ADJ_OFFSET
+    return t * _ADJ_INVSPEED if t > 0.0 else 0.0
 
 # ==================== ENV / constants ====================
-VOICE_STYLE    = os.getenv("TTS_STYLE", "narration-professional")
+VOICE_STYLE    = _ENV.get("TTS_STYLE", "narration-professional")
 TARGET_MIN_SEC = _env_float("TARGET_MIN_SEC", 180.0 if LONGFORM else 22.0)
 TARGET_MAX_SEC = _env_float("TARGET_MAX_SEC", 300.0 if LONGFORM else 42.0)
 
-CHANNEL_NAME   = os.getenv("CHANNEL_NAME", "DefaultChannel")
-MODE           = os.getenv("MODE", "freeform").strip().lower()
+CHANNEL_NAME   = _ENV.get("CHANNEL_NAME", "DefaultChannel")
+MODE           = _ENV.get("MODE", "freeform").strip().lower()
 
-LANG           = _sanitize_lang(os.getenv("VIDEO_LANG") or os.getenv("LANG") or "en")
-VISIBILITY     = _sanitize_privacy(os.getenv("VISIBILITY"))
+LANG           = _sanitize_lang(_ENV.get("VIDEO_LANG") or _ENV.get("LANG") or "en")
+VISIBILITY     = _sanitize_privacy(_ENV.get("VISIBILITY"))
 ROTATION_SEED  = _env_int("ROTATION_SEED", 0)
 
 # --- Yeni: Altyazı yerine bilgi kartı overlay ayarları ---
-INFO_OVERLAYS_ENABLE = (os.getenv("INFO_OVERLAYS_ENABLE", "1") == "1")
+INFO_OVERLAYS_ENABLE = (_ENV.get("INFO_OVERLAYS_ENABLE", "1") == "1")
 OVERLAY_MIN_SEC      = _env_float("OVERLAY_MIN_SEC", 3.2)   # kart minimum görünme
 OVERLAY_MAX_SEC      = _env_float("OVERLAY_MAX_SEC", 5.0)   # kart maksimum görünme
 OVERLAY_START_FRACT  = _env_float("OVERLAY_START_FRACT", 0.08)  # segmentin başından % kaç sonra başlasın
 # Karaoke altyazı kapatma (bilgi kartı modunda)
 if INFO_OVERLAYS_ENABLE:
-    os.environ["KARAOKE_CAPTIONS"] = "0"
-    os.environ["REQUIRE_CAPTIONS"] = "0"
+    os.environ["KARAOKE_CAPTIONS"] = _ENV["KARAOKE_CAPTIONS"] = "0"
+    os.environ["REQUIRE_CAPTIONS"] = _ENV["REQUIRE_CAPTIONS"] = "0"
 
-REQUIRE_CAPTIONS = os.getenv("REQUIRE_CAPTIONS", "0") == "1"
-KARAOKE_CAPTIONS = os.getenv("KARAOKE_CAPTIONS", "1") == "1"
+REQUIRE_CAPTIONS = _ENV.get("REQUIRE_CAPTIONS", "0") == "1"
+KARAOKE_CAPTIONS = _ENV.get("KARAOKE_CAPTIONS", "1") == "1"
 
-KARAOKE_ACTIVE   = os.getenv("KARAOKE_ACTIVE",   "#3EA6FF")
-KARAOKE_INACTIVE = os.getenv("KARAOKE_INACTIVE", "#FFD700")
-KARAOKE_OUTLINE  = os.getenv("KARAOKE_OUTLINE",  "#000000")
-CAPTION_LEAD_MS  = int(os.getenv("CAPTION_LEAD_MS", "60"))
+KARAOKE_ACTIVE   = _ENV.get("KARAOKE_ACTIVE",   "#3EA6FF")
+KARAOKE_INACTIVE = _ENV.get("KARAOKE_INACTIVE", "#FFD700")
+KARAOKE_OUTLINE  = _ENV.get("KARAOKE_OUTLINE",  "#000000")
+CAPTION_LEAD_MS  = int(_ENV.get("CAPTION_LEAD_MS", "60"))
 
 OUT_DIR        = "out"; pathlib.Path(OUT_DIR).mkdir(exist_ok=True)
 
-PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "").strip()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
-USE_GEMINI     = os.getenv("USE_GEMINI", "1") == "1"
-GEMINI_MODEL   = os.getenv("GEMINI_MODEL", "gemini-2.5-flash").strip()
-GEMINI_PROMPT  = (os.getenv("GEMINI_PROMPT") or "").strip()
+PEXELS_API_KEY = _ENV.get("PEXELS_API_KEY", "").strip()
+GEMINI_API_KEY = _ENV.get("GEMINI_API_KEY", "").strip()
+USE_GEMINI     = _ENV.get("USE_GEMINI", "1") == "1"
+GEMINI_MODEL   = _ENV.get("GEMINI_MODEL", "gemini-2.5-flash").strip()
+GEMINI_PROMPT  = (_ENV.get("GEMINI_PROMPT") or "").strip()
 GEMINI_TEMP    = _env_float("GEMINI_TEMP", 0.85)
+GEMINI_PARALLEL = max(1, _env_int("GEMINI_PARALLEL", 1))  # >1: farklı sıcaklıklarla eşzamanlı istek, en iyi skor seçilir
 
 # ---- Contextual CTA (comments-focused) ----
-CTA_ENABLE      = os.getenv("CTA_ENABLE", "1") == "1"
+CTA_ENABLE      = _ENV.get("CTA_ENABLE", "1") == "1"
 CTA_SHOW_SEC    = _env_float("CTA_SHOW_SEC", 2.8)
 CTA_MAX_CHARS   = _env_int("CTA_MAX_CHARS", 64)
-CTA_TEXT_FORCE  = (os.getenv("CTA_TEXT") or "").strip()
+CTA_TEXT_FORCE  = (_ENV.get("CTA_TEXT") or "").strip()
 
 # ---- Topic & user seed terms ----
-TOPIC_RAW = os.getenv("TOPIC", "").strip()
-TOPIC = re.sub(r'^[\'"]|[\'"]$', '', TOPIC_RAW).strip()
-
-def _parse_terms(s: str) -> List[str]:
+# import'ta ayrıştırılmaz; ilk kullanımda bir kez. TOPIC/TOPIC_RAW/SEARCH_TERMS_ENV modül öznitelikleri
+# dışarıdan okunmaya devam eder (aşağıdaki __getattr__), modül içi kod getter'ları çağırır.
+@functools.lru_cache(maxsize=1)
+def _topic() -> str:
+    return _RE_QUOTES.sub('', _ENV.get("TOPIC", "").strip()).strip()
+
+@functools.lru_cache(maxsize=64)
+def _parse_terms(s: str) -> Tuple[str, ...]:
+    # önbellekli → değiştirilemez tuple döner; liste gereken yerde list(...) ile kopyalanır
     s = (s or "").strip()
-    if not s: return []
+    if not s: return ()
     try:
         data = json.loads(s)
-        if isinstance(data, list): return [str(x).strip() for x in data if str(x).strip()]
+        if isinstance(data, list): return tuple(str(x).strip() for x in data if str(x).strip())
     except Exception:
         pass
-    s = re.sub(r'^[\[\(]|\s*[\]\)]$', '', s)
-    parts = re.split(r'\s*,\s*', s)
-    return [p.strip().strip('"').strip("'") for p in parts if p.strip()]
+    if s[:1] in "[(": s = s[1:]
+    if s[-1:] in ")]": s = s[:-1].rstrip()
+    parts = _RE_TERMSPLIT.split(s)
+    return tuple(p.strip().strip('"').strip("'") for p in parts if p.strip())
+
+def _search_terms_env() -> Tuple[str, ...]:
+    return _parse_terms(_ENV.get("SEARCH_TERMS", ""))  # _parse_terms önbellekli
+
+_LAZY_ATTRS = {
+    "TOPIC_RAW":        lambda: _ENV.get("TOPIC", "").strip(),
+    "TOPIC":            _topic,
+    "SEARCH_TERMS_ENV": lambda: list(_search_terms_env()),
+}
 
-SEARCH_TERMS_ENV = _parse_terms(os.getenv("SEARCH_TERMS", ""))
+def __getattr__(name: str):
+    if name in _LAZY_ATTRS:
+        return _LAZY_ATTRS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-TARGET_FPS       = int(os.getenv("TARGET_FPS", "25"))
+TARGET_FPS       = int(_ENV.get("TARGET_FPS", "25"))
 CRF_VISUAL       = 22
+# Son (görünür) encode'lar: segment+yazı, birleştirme, kare kilitleme(+CTA). "medium" kısa klipte belirgin kazanç
+# olmadan 3–4× yavaş; lookahead/ref kısaltılır. Ara all-intra segmentler ayrıca "superfast".
+VISUAL_PRESET      = _ENV.get("VISUAL_PRESET", "veryfast").strip() or "veryfast"
+VISUAL_X264_PARAMS = _ENV.get("VISUAL_X264_PARAMS", "rc-lookahead=10:ref=2").strip()
+
+def _x264_args(crf: int) -> List[str]:
+    return ["-c:v","libx264","-preset",VISUAL_PRESET,"-crf",str(crf),
+            *(("-x264-params", VISUAL_X264_PARAMS) if VISUAL_X264_PARAMS else ())]
+
+# Donanım H.264 kodlayıcı: auto → ilk çalışan (nvenc > qsv > videotoolbox); 0/off → her zaman libx264; ya da doğrudan ad.
+VIDEO_HWENC = _ENV.get("VIDEO_HWENC", "auto").strip().lower()
+_HWENC_ORDER = ("h264_nvenc", "h264_qsv", "h264_videotoolbox")
+
+@functools.lru_cache(maxsize=1)
+def _hw_encoder() -> Optional[str]:
+    """`ffmpeg -encoders` listesi yetmez (statik derlemeler GPU olmadan da nvenc listeler) → kısa deneme encode'u."""
+    if VIDEO_HWENC in ("", "0", "off", "none", "libx264"):
+        return None
+    try:
+        listed = run(["ffmpeg","-hide_banner","-encoders"], check=False).stdout
+    except Exception:
+        return None
+    cands = _HWENC_ORDER if VIDEO_HWENC == "auto" else (VIDEO_HWENC,)
+    for enc in cands:
+        if enc not in listed:
+            continue
+        try:
+            res = run(["ffmpeg","-hide_banner","-loglevel","error",
+                       "-f","lavfi","-i","color=c=black:s=256x256:r=25","-frames:v","3",
+                       "-pix_fmt","yuv420p","-c:v",enc,"-f","null","-"], check=False)
+        except Exception:
+            continue
+        if res.returncode == 0:
+            print(f"🚀 HW video encoder: {enc}")
+            return enc
+    return None
 
-CAPTION_MAX_LINE  = int(os.getenv("CAPTION_MAX_LINE",  "36" if VIDEO_W > VIDEO_H else "28"))
-CAPTION_MAX_LINES = int(os.getenv("CAPTION_MAX_LINES", "4"  if VIDEO_W > VIDEO_H else "6"))
+def _venc_args(crf: int) -> List[str]:
+    """Görünür encode'ların kodlayıcı argümanları; donanım kodlayıcı yoksa libx264 (_x264_args)."""
+    enc = _hw_encoder()
+    if enc == "h264_nvenc":
+        return ["-c:v",enc,"-preset","p4","-rc","vbr","-cq",str(crf),"-b:v","0"]
+    if enc == "h264_qsv":
+        return ["-c:v",enc,"-global_quality",str(crf)]
+    if enc == "h264_videotoolbox":
+        return ["-c:v",enc,"-q:v",str(max(1, min(100, int(round(100 - crf*1.6)))))]
+    return _x264_args(crf)
+# Segmentler aynı codec/profil/extradata ile üretildiyse concat demuxer + stream copy (yeniden encode yok)
+VIDEO_CONCAT_COPY = _ENV.get("VIDEO_CONCAT_COPY", "1") == "1"
+
+# Sahne segmentleri paralel encode edilir; her ffmpeg çekirdeklerin adil payını alır (x264 thrash olmasın).
+# cpu_count() makinedeki tüm çekirdekleri sayar; konteyner/CI'da sürece izin verilen kümeyi (affinity) esas al
+_CPU_COUNT       = (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()) or 2
+SEGMENT_WORKERS  = max(1, _env_int("SEGMENT_WORKERS", max(1, _CPU_COUNT // 2)))
+SEGMENT_THREADS  = max(1, _CPU_COUNT // SEGMENT_WORKERS)
+
+CAPTION_MAX_LINE  = int(_ENV.get("CAPTION_MAX_LINE",  "36" if VIDEO_W > VIDEO_H else "28"))
+CAPTION_MAX_LINES = int(_ENV.get("CAPTION_MAX_LINES", "4"  if VIDEO_W > VIDEO_H else "6"))
 
 # ---------- Pexels ayarları ----------
-PEXELS_PER_PAGE            = int(os.getenv("PEXELS_PER_PAGE", "30"))
-PEXELS_MAX_USES_PER_CLIP   = int(os.getenv("PEXELS_MAX_USES_PER_CLIP", "1"))
-PEXELS_ALLOW_REUSE         = os.getenv("PEXELS_ALLOW_REUSE", "0") == "1"
-PEXELS_ALLOW_LANDSCAPE     = os.getenv("PEXELS_ALLOW_LANDSCAPE", "1") == "1"
-PEXELS_MIN_DURATION        = int(os.getenv("PEXELS_MIN_DURATION", "3"))
-PEXELS_MAX_DURATION        = int(os.getenv("PEXELS_MAX_DURATION", "13"))
-PEXELS_MIN_HEIGHT          = int(os.getenv("PEXELS_MIN_HEIGHT",   "1280"))
-PEXELS_STRICT_VERTICAL     = os.getenv("PEXELS_STRICT_VERTICAL", "1") == "1"
-
-ALLOW_PIXABAY_FALLBACK     = os.getenv("ALLOW_PIXABAY_FALLBACK", "1") == "1"
-PIXABAY_API_KEY            = os.getenv("PIXABAY_API_KEY", "").strip()
+PEXELS_PER_PAGE            = int(_ENV.get("PEXELS_PER_PAGE", "30"))
+PEXELS_MAX_USES_PER_CLIP   = int(_ENV.get("PEXELS_MAX_USES_PER_CLIP", "1"))
+PEXELS_ALLOW_REUSE         = _ENV.get("PEXELS_ALLOW_REUSE", "0") == "1"
+PEXELS_ALLOW_LANDSCAPE     = _ENV.get("PEXELS_ALLOW_LANDSCAPE", "1") == "1"
+PEXELS_MIN_DURATION        = int(_ENV.get("PEXELS_MIN_DURATION", "3"))
+PEXELS_MAX_DURATION        = int(_ENV.get("PEXELS_MAX_DURATION", "13"))
+PEXELS_MIN_HEIGHT          = int(_ENV.get("PEXELS_MIN_HEIGHT",   "1280"))
+PEXELS_STRICT_VERTICAL     = _ENV.get("PEXELS_STRICT_VERTICAL", "1") == "1"
+PEXELS_SEARCH_WORKERS      = max(1, _env_int("PEXELS_SEARCH_WORKERS", _env_int("HTTP_CONCURRENCY", 8)))  # eşzamanlı arama isteği
+PEXELS_API_RPS             = _env_float("PEXELS_API_RPS", 5.0)  # Pexels/Pixabay API istek hızı tavanı (0 → sınırsız)
+PEXELS_DOWNLOAD_WORKERS    = max(1, _env_int("PEXELS_DOWNLOAD_WORKERS", 6)) # eşzamanlı klip indirme (throttle'a takılmadan)
+PEXELS_CACHE_TTL           = _env_float("PEXELS_CACHE_TTL", 600.0)       # arama sonuçları süreç içinde bu kadar sn saklanır
+PEXELS_PREFETCH            = _ENV.get("PEXELS_PREFETCH", "1") == "1"      # Gemini beklenirken konu sorgularını önceden ara
+
+ALLOW_PIXABAY_FALLBACK     = _ENV.get("ALLOW_PIXABAY_FALLBACK", "1") == "1"
+PIXABAY_API_KEY            = _ENV.get("PIXABAY_API_KEY", "").strip()
 
 # ---- State dosyaları ----
-STATE_FILE = f"state_{re.sub(r'[^A-Za-z0-9]+','_',CHANNEL_NAME)}.json"
+STATE_FILE = f"state_{_RE_NONALNUM_RUN.sub('_',CHANNEL_NAME)}.json"
 GLOBAL_TOPIC_STATE = "state_global_topics.json"
 LEGACY_STATE_FILE = f"state_{CHANNEL_NAME}.json"
 LEGACY_GLOBAL_STATE = "state_global.json"
+CACHE_DIR = _ENV.get("CACHE_DIR", ".cache")  # çalıştırmalar arası önbellekler (API, BGM, ffmpeg filtre listesi)
 
 # === NOVELTY (tekrar engelleme) — ENV ===
-NOVELTY_ENFORCE       = os.getenv("NOVELTY_ENFORCE", "1") == "1"
+NOVELTY_ENFORCE       = _ENV.get("NOVELTY_ENFORCE", "1") == "1"
 NOVELTY_WINDOW        = _env_int("NOVELTY_WINDOW", 40)
 NOVELTY_JACCARD_MAX   = _env_float("NOVELTY_JACCARD_MAX", 0.55)
 NOVELTY_RETRIES       = _env_int("NOVELTY_RETRIES", 4)
 
 # === BGM (arka müzik) — ENV ===
-BGM_ENABLE  = os.getenv("BGM_ENABLE", "0") == "1"
+BGM_ENABLE  = _ENV.get("BGM_ENABLE", "0") == "1"
 BGM_DB      = _env_float("BGM_DB", -26.0)
 BGM_DUCK_DB = _env_float("BGM_DUCK_DB", -12.0)
 BGM_FADE    = _env_float("BGM_FADE", 0.8)
-BGM_DIR     = os.getenv("BGM_DIR", "bgm").strip()
-BGM_URLS    = _parse_terms(os.getenv("BGM_URLS", ""))
+BGM_DIR     = _ENV.get("BGM_DIR", "bgm").strip()
+BGM_URLS    = _parse_terms(_ENV.get("BGM_URLS", ""))
+
+def _bgm_url_ext(u: str) -> str:
+    from urllib.parse import urlparse
+    ext = os.path.splitext(urlparse(u).path)[1].lower()
+    return ext if ext in (".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac") else ".mp3"
+
+_BGM_SOURCES = tuple((u, _bgm_url_ext(u)) for u in BGM_URLS)  # (url, uzantı) — sorgu dizesi/büyük harf uzantıyı bozmaz
 
 # ==================== deps (auto-install) ====================
 def _pip(p): subprocess.run([sys.executable, "-m", "pip", "install", "-q", p], check=True)
@@ -242,6 +391,17 @@ try:
     import requests
 except ImportError:
     _pip("requests"); import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Tek Session: keep-alive + bağlantı havuzu (her istekte yeni TLS el sıkışması yok);
+# geçici hatalar (429/5xx) adapter seviyesinde kısa backoff ile yeniden denenir (POST hariç).
+# raise_on_status=False: denemeler tükenince son yanıt döner (RetryError yok) → çağıranların status_code kontrolü çalışır
+_HTTP = requests.Session()
+_HTTP.headers.update({"Connection": "keep-alive"})
+_HTTP_RETRY = Retry(total=3, backoff_factor=0.4, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+_HTTP.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=_HTTP_RETRY))
+_HTTP.mount("http://",  HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=_HTTP_RETRY))
 try:
     import edge_tts, nest_asyncio
 except ImportError:
@@ -268,33 +428,127 @@ VOICE_OPTIONS = {
     ],
     "tr": ["tr-TR-EmelNeural","tr-TR-AhmetNeural"]
 }
-VOICE = os.getenv("TTS_VOICE", VOICE_OPTIONS.get(LANG, ["en-US-JennyNeural"])[0])
+VOICE = _ENV.get("TTS_VOICE", VOICE_OPTIONS.get(LANG, ["en-US-JennyNeural"])[0])
 
 # ==================== Utils ====================
+# stdin DEVNULL (ffmpeg -nostdin etkisi): ffmpeg terminali etkileşimli komut için dinleyip
+# CI'da/arka planda takılmaz ya da SIGTTIN ile durmaz
 def run(cmd, check=True):
-    res = subprocess.run(cmd, text=True, capture_output=True)
+    res = subprocess.run(cmd, text=True, capture_output=True, stdin=subprocess.DEVNULL)
     if check and res.returncode != 0:
         raise RuntimeError(res.stderr[:4000])
     return res
 
-def ffprobe_dur(p):
+def run_fast(cmd, check=True, input: Optional[bytes] = None):
+    # stdout'u kullanılmayan ffmpeg çağrıları: stdout DEVNULL, yalnızca stderr (hata mesajı) yakalanır;
+    # input verilirse (ör. mp3 baytları) stdin'den beslenir
+    res = subprocess.run(cmd, input=input, stdin=(subprocess.DEVNULL if input is None else None),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if check and res.returncode != 0:
+        raise RuntimeError(res.stderr.decode("utf-8", "replace")[:4000])
+    return res
+
+def _fast_rmtree(root: str):
+    # tmp dizini düz ve sembolik bağsız: DirEntry tür bilgisi (d_type) ile ek stat yok; alt dizinler post-order silinir
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                _fast_rmtree(e.path)
+            else:
+                os.unlink(e.path)
+    os.rmdir(root)
+
+def _write_silence_wav(path: str, seconds: float, sr: int = 48000):
+    # sessiz PCM (s16le, mono) doğrudan yazılır — birkaç yüz ms sıfır için ffmpeg/anullsrc başlatmaya gerek yok
+    import wave
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1); w.setsampwidth(2); w.setframerate(sr)
+        w.writeframes(b"\x00\x00" * int(round(seconds * sr)))
+
+def _ffprobe_dur_raw(p) -> float:
     try:
-        out = run(["ffprobe","-v","quiet","-show_entries","format=duration","-of","csv=p=0", p]).stdout.strip()
+        out = run(["ffprobe","-v","quiet","-threads","0","-probesize","32k","-analyzeduration","0",
+                   "-show_entries","format=duration","-of","csv=p=0", p]).stdout.strip()
         return float(out) if out else 0.0
     except:
         return 0.0
 
-def ffmpeg_has_filter(name: str) -> bool:
+def _wav_dur(p: str) -> float:
+    # PCM WAV (TTS, concat, süre kilidi çıktıları): süre başlıktan okunur → ffprobe süreci yok.
+    # Okunamayan başlık (ör. WAVE_FORMAT_EXTENSIBLE) 0.0 döner ve ffprobe yoluna düşer.
+    import wave
+    try:
+        with wave.open(p, "rb") as w:
+            sr = w.getframerate()
+            return (w.getnframes() / float(sr)) if sr > 0 else 0.0
+    except Exception:
+        return 0.0
+
+@functools.lru_cache(maxsize=512)
+def _ffprobe_dur_cached(p, mtime_ns: int, size: int) -> float:
+    if p.lower().endswith(".wav"):
+        d = _wav_dur(p)
+        if d > 0.0:
+            return d
+    return _ffprobe_dur_raw(p)
+
+def ffprobe_dur(p):
+    # (path, mtime, size) anahtarı: dosya yeniden yazılınca cache kendiliğinden geçersizleşir
+    try:
+        st = os.stat(p)
+    except FileNotFoundError:
+        return 0.0  # olmayan dosya için ffprobe başlatmaya gerek yok (sonuç zaten 0.0)
+    except OSError:
+        return _ffprobe_dur_raw(p)
+    if st.st_size == 0:
+        return 0.0  # boş dosya: süre yok
+    return _ffprobe_dur_cached(str(p), st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=1)
+def _ffmpeg_filters() -> frozenset:
+    """`ffmpeg -filters` tek sefer çalıştırılır; filtre adları (2. sütun) kümeye alınır.
+    Liste ffmpeg ikilisinin (yol, mtime, boyut) kimliğiyle CACHE_DIR'de saklanır → sonraki çalıştırmalarda süreç yok."""
+    import shutil
+    ident = None
+    exe = shutil.which("ffmpeg")
+    if exe:
+        try:
+            st = os.stat(exe); ident = f"{os.path.realpath(exe)}|{st.st_mtime_ns}|{st.st_size}"
+        except OSError:
+            pass
+    cache = pathlib.Path(CACHE_DIR) / "ffmpeg_filters.json"
+    if ident:
+        try:
+            cached = json.loads(cache.read_text(encoding="utf-8"))
+            if cached.get("id") == ident and cached.get("filters"):
+                return frozenset(cached["filters"])
+        except Exception:
+            pass
     try:
         out = run(["ffmpeg","-hide_banner","-filters"], check=False).stdout
-        return bool(re.search(rf"\b{name}\b", out))
     except Exception:
-        return False
+        return frozenset()
+    names = set()
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            names.add(parts[1])
+    if ident and names:
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(json.dumps({"id": ident, "filters": sorted(names)}), encoding="utf-8")
+        except OSError:
+            pass
+    return frozenset(names)
+
+def ffmpeg_has_filter(name: str) -> bool:
+    return name in _ffmpeg_filters()
 
 _HAS_DRAWTEXT   = ffmpeg_has_filter("drawtext")
 _HAS_SUBTITLES  = ffmpeg_has_filter("subtitles")
 _HAS_SIDECHAIN  = ffmpeg_has_filter("sidechaincompress")
 
+@functools.lru_cache(maxsize=1)
 def font_path():
     for p in ["/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
               "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
@@ -315,42 +569,26 @@ def _ff_sanitize_path(path_str: str) -> str:
 def normalize_sentence(raw: str) -> str:
     s = (raw or "").strip()
     s = s.replace("\\n", "\n").replace("\r\n", "\n").replace("\r", "\n")
-    s = "\n".join(re.sub(r"\s+", " ", ln).strip() for ln in s.split("\n"))
-    s = s.replace("—", "-").replace("–", "-").replace("“", '"').replace("”", '"').replace("’", "'")
-    s = re.sub(r"[\u200B-\u200D\uFEFF]", "", s)
-    return s
+    s = "\n".join(_RE_WS.sub(" ", ln).strip() for ln in s.split("\n"))
+    return s.translate(_SENTENCE_TRANS)
 
 # ---------- CTA keyword helpers ----------
 _STOP_EN = set("the a an and or but if while of to in on at from by with for about into over after before between during under above across around through this that these those is are was were be been being have has had do does did can could should would may might will your you we our they their he she it its as than then so very more most many much just also only even still yet".split())
 _STOP_TR = set("ve ya ama eğer iken ile için üzerine altında üzerinde arasında boyunca sonra önce boyunca altında üstünde hakkında üzerinden arasında bu şu o bir birisi şunlar bunlar biz siz onlar var yok çok daha en ise çünkü gibi kadar zaten sadece yine hâlâ".split())
 
-def _kw_tokens(text: str, lang: str) -> list[str]:
-    t = re.sub(r"[^A-Za-zçğıöşüÇĞİÖŞÜ0-9 ]+", " ", (text or "")).lower()
-    ws = [w for w in t.split() if len(w) >= 4 and w not in (_STOP_TR if lang.startswith("tr") else _STOP_EN)]
-    return ws
+@functools.lru_cache(maxsize=2048)
+def _kw_tokens(text: str, lang: str) -> Tuple[str, ...]:
+    t = _RE_KW_NONALPHA.sub(" ", (text or "")).lower()
+    stop = _STOP_TR if lang.startswith("tr") else _STOP_EN
+    return tuple(w for w in t.split() if len(w) >= 4 and w not in stop)
 
 def _top_keywords(topic: str, sentences: list[str], lang: str, k: int = 6) -> list[str]:
-    from collections import Counter
-    cnt = Counter()
-    for s in [topic] + list(sentences or []):
-        for w in _kw_tokens(s, lang):
-            cnt[w] += 1
-    bigr = Counter()
-    toks_all = _kw_tokens(" ".join([topic] + sentences), lang)
-    for i in range(len(toks_all)-1):
-        bigr[toks_all[i] + " " + toks_all[i+1]] += 1
-    scored = []
-    for w,c in cnt.items():
-        scored.append((c, w))
-    for bg,c in bigr.items():
-        scored.append((c*2, bg))
-    scored.sort(reverse=True)
-    out=[]
-    for _,w in scored:
-        if w not in out:
-            out.append(w)
-        if len(out) >= k: break
-    return out
+    # tek tokenizasyon: unigram + (ağırlık 2) bigram aynı sayaçta; anahtarlar çakışmaz (bigram boşluk içerir)
+    toks = _kw_tokens(" ".join([topic] + list(sentences or [])), lang)
+    score = Counter(toks)
+    for a, b in zip(toks, toks[1:]):
+        score[a + " " + b] += 2
+    return [w for _, w in heapq.nlargest(k, ((c, w) for w, c in score.items()))]
 
 def build_contextual_cta(topic: str, sentences: list[str], lang: str) -> str:
     if CTA_TEXT_FORCE:
@@ -377,97 +615,197 @@ def build_contextual_cta(topic: str, sentences: list[str], lang: str) -> str:
         ]
     for _ in range(10):
         t = templates[rng.randrange(len(templates))](a, b).strip()
-        t = re.sub(r"\s+", " ", t)
+        t = _RE_WS.sub(" ", t)
         if len(t) <= CTA_MAX_CHARS:
             return t
     return (templates[0](a,b))[:CTA_MAX_CHARS]
 
 # ==================== State ====================
+# orjson varsa state (de)serileştirme onunla (bytes), yoksa stdlib json.
+# State/önbellek yalnızca makine okur → kompakt; girintili çıktı sadece insan okuyan debug meta için.
+try:
+    import orjson
+    def _json_dumps(obj, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2) if pretty else orjson.dumps(obj)
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj, pretty: bool = False) -> bytes:
+        if pretty: return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _json_loads = json.loads
+
 def _load_json(path, default):
-    try: return json.load(open(path, "r", encoding="utf-8"))
+    try: return _json_loads(pathlib.Path(path).read_bytes())
     except: return default
 
 def _save_json(path, data):
-    txt = json.dumps(data, indent=2, ensure_ascii=False)
-    pathlib.Path(path).write_text(txt, encoding="utf-8")
+    import tempfile
+    buf = _json_dumps(data)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp_state_")
     try:
-        if path == STATE_FILE:
-            pathlib.Path(LEGACY_STATE_FILE).write_text(txt, encoding="utf-8")
-        if path == GLOBAL_TOPIC_STATE:
-            pathlib.Path(LEGACY_GLOBAL_STATE).write_text(txt, encoding="utf-8")
+        # mkstemp 0600 açar; replace sonrası izinler eski dosyanınki (yoksa umask'lı 0666) olsun
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            um = os.umask(0); os.umask(um)
+            mode = 0o666 & ~um
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, path)
     except Exception:
-        pass
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        raise
+    # eski adla yansı: ad aynıysa (kanal adı zaten alfanümerik) ikinci yazım gereksiz ve atomik replace'i bozar
+    legacy = {STATE_FILE: LEGACY_STATE_FILE, GLOBAL_TOPIC_STATE: LEGACY_GLOBAL_STATE}.get(path)
+    if legacy and legacy != path:
+        try:
+            pathlib.Path(legacy).write_bytes(buf)
+        except Exception:
+            pass
+
+class _StateCache:
+    """JSON state: süreç başına bir kez okunur, değişiklikler bellekte toplanır, çıkışta (atexit) tek seferde yazılır."""
+    def __init__(self, path: str, legacy: str, default, trim=None):
+        self.path, self.legacy = path, legacy
+        self.default, self.trim = default, trim
+        self.data: Optional[dict] = None
+        self.dirty = False
+
+    def get(self) -> dict:
+        if self.data is None:
+            if pathlib.Path(self.path).exists():
+                self.data = _load_json(self.path, self.default())
+            elif pathlib.Path(self.legacy).exists():
+                self.data = _load_json(self.legacy, self.default())
+                self.dirty = True  # eski isimden taşınan state yeni dosyaya yazılsın
+            else:
+                self.data = self.default()
+        return self.data
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def invalidate(self):
+        # dosya dışarıdan değiştiyse: bellek kopyası atılır (yazılmamış değişiklikler dahil), sonraki get() diskten okur
+        self.data = None
+        self.dirty = False
 
-def _state_load() -> dict:
-    if pathlib.Path(STATE_FILE).exists():
-        return _load_json(STATE_FILE, {"recent": [], "used_pexels_ids": []})
-    if pathlib.Path(LEGACY_STATE_FILE).exists():
-        st = _load_json(LEGACY_STATE_FILE, {"recent": [], "used_pexels_ids": []})
-        _save_json(STATE_FILE, st)
-        return st
-    return {"recent": [], "used_pexels_ids": []}
+    def flush(self):
+        if not self.dirty or self.data is None:
+            return
+        if self.trim: self.trim(self.data)
+        _save_json(self.path, self.data)
+        self.dirty = False
 
-def _state_save(st: dict):
+def _state_trim(st: dict):
     st["recent"] = st.get("recent", [])[-1200:]
     st["used_pexels_ids"] = st.get("used_pexels_ids", [])[-5000:]
-    _save_json(STATE_FILE, st)
-
-def _global_topics_load() -> dict:
-    default = {"recent_topics": []}
-    if pathlib.Path(GLOBAL_TOPIC_STATE).exists():
-        return _load_json(GLOBAL_TOPIC_STATE, default)
-    if pathlib.Path(LEGACY_GLOBAL_STATE).exists():
-        gst = _load_json(LEGACY_GLOBAL_STATE, default)
-        _save_json(GLOBAL_TOPIC_STATE, gst)
-        return gst
-    return default
-
-def _global_topics_save(gst: dict):
+
+_STATE = _StateCache(STATE_FILE, LEGACY_STATE_FILE, lambda: {"recent": [], "used_pexels_ids": []}, _state_trim)
+atexit.register(_STATE.flush)
+
+# ---- Kalıcı API önbelleği (çalıştırmalar arası; CACHE_DIR/api_cache.sqlite) ----
+PEXELS_DISK_CACHE_TTL = _env_float("PEXELS_DISK_CACHE_TTL", 6 * 3600.0)  # 0 → kapalı
+# Varsayılan kapalı: aynı prompt → aynı içerik → novelty kontrolü reddeder; geliştirme/offline deneme için açılır
+GEMINI_DISK_CACHE_TTL = _env_float("GEMINI_DISK_CACHE_TTL", 0.0)
+
+class _DiskCache:
+    """sqlite anahtar/değer önbelleği; değerler JSON, her kayıt kendi son kullanma zamanıyla. Hatalar sessizce miss sayılır."""
+    def __init__(self, path: str):
+        import threading
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _db(self):
+        if self.conn is None:
+            import sqlite3
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, exp REAL, v BLOB)")
+        return self.conn
+
+    @staticmethod
+    def key(ns: str, *parts) -> str:
+        import hashlib
+        return ns + ":" + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        try:
+            with self.lock:
+                row = self._db().execute("SELECT exp, v FROM kv WHERE k=?", (key,)).fetchone()
+        except Exception:
+            return None
+        if not row or row[0] < time.time():
+            return None
+        try:
+            return _json_loads(row[1])
+        except Exception:
+            return None
+
+    def set(self, key: str, value, ttl: float):
+        try:
+            with self.lock:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO kv (k, exp, v) VALUES (?,?,?)", (key, time.time() + ttl, _json_dumps(value)))
+                db.commit()
+        except Exception as e:
+            print(f"⚠️ cache write failed: {e}")
+
+_DISK_CACHE = _DiskCache(str(pathlib.Path(CACHE_DIR) / "api_cache.sqlite"))
+
+def _global_trim(gst: dict):
     gst["recent_topics"] = gst.get("recent_topics", [])[-4000:]
-    _save_json(GLOBAL_TOPIC_STATE, gst)
 
+# global topics + entities: tek okuma, çıkışta tek yazma (eskiden her kayıtta tüm JSON yeniden yazılıyordu)
+_GLOBAL = _StateCache(GLOBAL_TOPIC_STATE, LEGACY_GLOBAL_STATE, lambda: {"recent_topics": []}, _global_trim)
+atexit.register(_GLOBAL.flush)
+
+@functools.lru_cache(maxsize=4096)
 def _hash12(s: str) -> str:
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()[:12]
+    import hashlib
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=6).hexdigest()
 
-def _record_recent(h: str, mode: str, topic: str, fp: Optional[List[str]] = None):
-    st = _state_load()
+def _record_recent(h: str, mode: str, topic: str, fp: Optional[List[str]] = None, mh: Optional[str] = None):
+    st = _STATE.get()
     rec = {"h":h,"mode":mode,"topic":topic,"ts":time.time()}
     if fp: rec["fp"] = list(fp)
+    if mh: rec["mh"] = mh
     st.setdefault("recent", []).append(rec)
-    _state_save(st)
-    gst = _global_topics_load()
-    if topic and topic not in gst["recent_topics"]:
-        gst["recent_topics"].append(topic)
-        _global_topics_save(gst)
+    _STATE.mark_dirty()
+    gst = _GLOBAL.get()
+    topics = gst.setdefault("recent_topics", [])
+    if topic and topic not in topics:
+        topics.append(topic)
+        _GLOBAL.mark_dirty()
 
 def _blocklist_add_pexels(ids: List[int], days=30):
-    st = _state_load()
+    st = _STATE.get()
     now = int(time.time())
     for vid in ids:
         st.setdefault("used_pexels_ids", []).append({"id": int(vid), "ts": now})
     cutoff = now - days*86400
     st["used_pexels_ids"] = [x for x in st.get("used_pexels_ids", []) if x.get("ts",0) >= cutoff]
-    _state_save(st)
+    _STATE.mark_dirty()
 
 def _blocklist_get_pexels() -> set:
-    st = _state_load()
+    st = _STATE.get()
     return {int(x["id"]) for x in st.get("used_pexels_ids", [])}
 
 def _recent_topics_for_prompt(limit=20) -> List[str]:
-    gst = _global_topics_load()
-    topics = list(reversed(gst.get("recent_topics", [])))
-    uniq=[]
-    for t in topics:
-        if t and t not in uniq: uniq.append(t)
+    uniq: Dict[str, None] = {}
+    for t in reversed(_GLOBAL.get().get("recent_topics", [])):
+        if t: uniq.setdefault(t, None)
         if len(uniq) >= limit: break
-    return uniq
+    return list(uniq)
 
 # ---- novelty helpers ----
-def _tok_words(s: str) -> List[str]:
-    s = re.sub(r"[^a-z0-9 ]+", " ", (s or "").lower())
-    return [w for w in s.split() if len(w) >= 3]
+@functools.lru_cache(maxsize=2048)
+def _tok_words(s: str) -> Tuple[str, ...]:
+    return tuple(_RE_TOKEN.findall((s or "").lower()))
 
-def _trigrams(words: List[str]) -> Set[str]:
+def _trigrams(words: Tuple[str, ...]) -> Set[str]:
     return {" ".join(words[i:i+3]) for i in range(len(words)-2)} if len(words) >= 3 else set()
 
 def _sentences_fp(sentences: List[str]) -> Set[str]:
@@ -479,25 +817,76 @@ def _jaccard(a: Set[str], b: Set[str]) -> float:
     inter = len(a & b); union = len(a | b)
     return (inter / union) if union else 0.0
 
-def _recent_fps_from_state(limit: int = NOVELTY_WINDOW) -> List[Set[str]]:
-    st = _state_load()
+# bottom-k MinHash: trigram başına tek 64-bit hash, en küçük K hash saklanır.
+# K'dan az trigram varsa sketch = tüm küme → tahmin birebir Jaccard olur.
+NOVELTY_SKETCH_K = 128
+
+def _fp_sketch(fp: Set[str], k: int = NOVELTY_SKETCH_K) -> List[int]:
+    # blake2b kalıcı (sketch'ler state'e yazılıyor) → hash() gibi PYTHONHASHSEED'e bağlı olamaz
+    import hashlib
+    b2, fb = hashlib.blake2b, int.from_bytes
+    return heapq.nsmallest(k, {fb(b2(t.encode("utf-8"), digest_size=8).digest(), "little") for t in fp})
+
+def _sketch_encode(sk: List[int]) -> str:
+    return base64.b64encode(struct.pack(f"<{len(sk)}Q", *sk)).decode("ascii")
+
+@functools.lru_cache(maxsize=256)
+def _sketch_decode(b64: str) -> frozenset:
+    # novelty retry'larında aynı geçmiş sketch'ler tekrar tekrar çözülmesin
+    try:
+        raw = base64.b64decode(b64)
+        return frozenset(struct.unpack(f"<{len(raw)//8}Q", raw[:len(raw)//8*8]))
+    except Exception:
+        return frozenset()
+
+def _sketch_jaccard(a, b, k: int = NOVELTY_SKETCH_K, sa: Optional[frozenset] = None) -> float:
+    if not a or not b: return 0.0
+    sa = sa if sa is not None else frozenset(a)
+    sb = b if isinstance(b, frozenset) else frozenset(b)
+    u = sa | sb
+    if len(u) <= k:
+        return len(sa & sb) / len(u)
+    thr = sorted(u)[k-1]          # birleşimin en küçük K'sı = eşik altı
+    return sum(1 for h in sa & sb if h <= thr) / k
+
+def _recent_fps_from_state(limit: int = NOVELTY_WINDOW) -> List[Tuple[List[str], frozenset]]:
+    # trigram listesi ham bırakılır; set'e yalnızca sketch'i olmayan ya da eşleşen kayıtlarda çevrilir
+    st = _STATE.get()
     out=[]
     for item in reversed(st.get("recent", [])):
         fp = item.get("fp")
         if isinstance(fp, list):
-            out.append(set(fp))
+            mh = item.get("mh")
+            out.append((fp, _sketch_decode(mh) if isinstance(mh, str) else frozenset()))
         if len(out) >= limit: break
     return out
 
+def _jaccard_over(cur: Set[str], fp: List[str], thr: float) -> bool:
+    """_jaccard(cur, set(fp)) > thr — set kurmadan; sonuç belli olduğu an (eşik aşıldı / artık aşılamaz) çıkar.
+    Kayıtlı fp tekil (sıralı set'ten kesilmiş) → |fp| = len(fp)."""
+    b = len(fp)
+    if not cur or not b: return False
+    # J > thr  ⇔  inter > thr·(|cur|+|fp|)/(1+thr)
+    need = thr * (len(cur) + b) / (1.0 + thr)
+    inter = 0
+    for i, t in enumerate(fp):
+        if t in cur:
+            inter += 1
+            if inter > need: return True
+        elif inter + (b - i - 1) <= need:
+            return False
+    return False
+
 def _novelty_ok(sentences: List[str]) -> Tuple[bool, List[str]]:
     if not NOVELTY_ENFORCE:
         return True, []
     cur = _sentences_fp(sentences)
     if not cur: return True, []
-    for fp in _recent_fps_from_state(NOVELTY_WINDOW):
-        sim = _jaccard(cur, fp)
-        if sim > NOVELTY_JACCARD_MAX:
-            common = list(cur & fp)
+    cur_sk = _fp_sketch(cur); cur_sk_set = frozenset(cur_sk)
+    for fp, sk in _recent_fps_from_state(NOVELTY_WINDOW):
+        if (_sketch_jaccard(cur_sk, sk, sa=cur_sk_set) > NOVELTY_JACCARD_MAX) if sk else \
+                _jaccard_over(cur, fp, NOVELTY_JACCARD_MAX):
+            common = list(cur & set(fp))
             terms = []
             for tri in common[:40]:
                 for w in tri.split():
@@ -514,13 +903,12 @@ CAPTION_COLORS = ["0xFFD700","0xFF6B35","0x00F5FF","0x32CD32","0xFF1493","0x1E90
 def _ff_color(c: str) -> str:
     c = (c or "").strip()
     if c.startswith("#"): return "0x" + c[1:].upper()
-    if re.fullmatch(r"0x[0-9A-Fa-f]{6}", c): return c
+    if _RE_HEXCOLOR.fullmatch(c): return c
     return "white"
 
 def clean_caption_text(s: str) -> str:
     t = (s or "").strip()
-    t = (t.replace("—", "-").replace("–", "-").replace("“", '"').replace("”", '"').replace("’", "'").replace("`",""))
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _RE_WS.sub(" ", t.translate(_CAPTION_TRANS)).strip()
     if t and t[0].islower():
         t = t[0].upper() + t[1:]
     return t
@@ -531,7 +919,7 @@ def wrap_mobile_lines(text: str, max_line_length: int = CAPTION_MAX_LINE, max_li
     words = text.split()
     HARD_CAP = max_lines + 2
     def distribute_into(k: int) -> list[str]:
-        per = math.ceil(len(words) / k)
+        per = -(-len(words) // k)
         chunks = [" ".join(words[i*per:(i+1)*per]) for i in range(k)]
         return [c for c in chunks if c]
     for k in range(2, max_lines + 1):
@@ -565,31 +953,53 @@ def _rate_to_atempo(rate_str: str, default: float = 1.10) -> float:
     except Exception:
         return default
 
-def _edge_stream_tts(text: str, voice: str, rate_env: str, mp3_out: str) -> List[Dict[str,Any]]:
+async def _edge_stream_tts_async(text: str, voice: str, rate_env: str,
+                                 wav_out: Optional[str] = None, atempo: float = 1.0) -> Tuple[bytes, List[Dict[str,Any]]]:
+    """wav_out verilirse ses parçaları geldikçe ffmpeg'in stdin'ine yazılır (ağ alımı + dönüştürme üst üste biner).
+    mp3 baytları yine de döndürülür (kısa çıkarsa yeniden işleme için)."""
     import asyncio
     marks: List[Dict[str,Any]] = []
-    async def _run():
-        audio = bytearray()
+    audio = bytearray()
+    proc = None
+    loop = asyncio.get_running_loop()
+    if wav_out:
+        proc = subprocess.Popen(_trim_cmd("pipe:0", wav_out, atempo),
+                                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
         comm = edge_tts.Communicate(text, voice=voice, rate=rate_env)
         async for chunk in comm.stream():
             t = chunk.get("type")
             if t == "audio":
-                audio.extend(chunk.get("data", b""))
+                data = chunk.get("data", b"")
+                audio.extend(data)
+                # pipe doluysa write bloklar → executor'da; event loop'taki diğer websocket akışları durmaz
+                if proc: await loop.run_in_executor(None, proc.stdin.write, data)
             elif t == "WordBoundary":
                 off = float(chunk.get("offset", 0))/10_000_000.0
                 dur = float(chunk.get("duration",0))/10_000_000.0
                 marks.append({"t0": off, "t1": off+dur, "text": str(chunk.get("text",""))})
-        open(mp3_out, "wb").write(bytes(audio))
+    except BaseException:
+        if proc:
+            proc.kill(); proc.wait()
+        raise
+    if proc:
+        _, err = await loop.run_in_executor(None, proc.communicate)
+        if proc.returncode != 0:
+            raise RuntimeError(err.decode("utf-8", "replace")[:4000])
+    return bytes(audio), marks
+
+def _run_async(coro_fn):
+    import asyncio
+    # yalnız zaten çalışan bir döngü varsa nest_asyncio; coroutine'in kendi RuntimeError'ları (ör. ffmpeg hatası) yukarı çıkar
     try:
-        asyncio.run(_run())
+        asyncio.get_running_loop()
     except RuntimeError:
-        nest_asyncio.apply()
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(_run())
-    return marks
+        return asyncio.run(coro_fn())
+    nest_asyncio.apply()
+    return asyncio.get_event_loop().run_until_complete(coro_fn())
 
 def _merge_marks_to_words(text: str, marks: List[Dict[str,Any]], total: float) -> List[Tuple[str,float]]:
-    words = [w for w in re.split(r"\s+", (text or "").strip()) if w]
+    words = [w for w in _RE_WS.split((text or "").strip()) if w]
     if not words:
         return []
     out=[]
@@ -597,11 +1007,10 @@ def _merge_marks_to_words(text: str, marks: List[Dict[str,Any]], total: float) -
         ms = [m for m in marks if (m.get("t1",0) > m.get("t0",0))]
         if len(ms) >= len(words)*0.6:
             N = min(len(words), len(ms))
-            raw_durs = [max(0.02, float(ms[i]["t1"]-ms[i]["t0"])) for i in range(N)]
-            sum_raw = sum(raw_durs) if raw_durs else 0.0
+            raw_durs = [max(0.02, float(m["t1"]-m["t0"])) for m in ms[:N]]
+            sum_raw = sum(raw_durs)
             scale = (total / sum_raw) if sum_raw > 0 else 1.0
-            for i in range(N):
-                out.append((words[i], max(0.05, raw_durs[i]*scale)))
+            out = [(w, max(0.05, d*scale)) for w, d in zip(words, raw_durs)]
             remain = max(0.0, total - sum(d for _,d in out))
             if len(words) > N and remain>0:
                 each = remain/(len(words)-N)
@@ -617,46 +1026,78 @@ def _merge_marks_to_words(text: str, marks: List[Dict[str,Any]], total: float) -
             out[-1] = (out[-1][0], max(0.05, out[-1][1] + (total-s)))
     return out
 
-def _trim_silence_and_norm(in_wav: str, out_wav: str, atempo: float):
-    # Kenar sessizliklerini kırp + normalize
-    run([
+def _trim_cmd(src: str, out_wav: str, atempo: float) -> List[str]:
+    # Kenar sessizliklerini kırp (+ hız). Normalizasyon concat_audios'ta tüm ses üzerinde tek geçişte.
+    # pipe:0 girişi her zaman mp3 (edge-tts / Google TTS) → -f mp3: format tespiti için akışın başı tamponlanmaz
+    return [
         "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-i", in_wav,
-        "-af", f"dynaudnorm=g=7:f=250,atempo={atempo},silenceremove=start_periods=1:start_duration=0.18:start_threshold=-45dB:stop_periods=1:stop_duration=0.22:stop_threshold=-45dB",
+        *(("-f","mp3") if src == "pipe:0" else ()),
+        "-i", src,
+        "-af", f"atempo={atempo},silenceremove=start_periods=1:start_duration=0.18:start_threshold=-45dB:stop_periods=1:stop_duration=0.22:stop_threshold=-45dB",
         "-ar","48000","-ac","1","-c:a","pcm_s16le",
         out_wav
-    ])
+    ]
 
-def tts_to_wav(text: str, wav_out: str) -> Tuple[float, List[Tuple[str,float]]]:
+def _trim_silence_and_norm(src, out_wav: str, atempo: float):
+    # src: dosya yolu ya da bellekteki ses baytları (stdin'den verilir)
+    data = src if isinstance(src, (bytes, bytearray)) else None
+    run_fast(_trim_cmd("pipe:0" if data is not None else src, out_wav, atempo), input=data)
+
+def _tts_voice_rate() -> Tuple[str, str]:
+    rate_env = _ENV.get("TTS_RATE", "+12%")
+    available = VOICE_OPTIONS.get(LANG, ["en-US-JennyNeural"])
+    return (VOICE if VOICE in available else available[0]), rate_env
+
+TTS_CONCURRENCY = max(1, _env_int("TTS_CONCURRENCY", 4))
+
+def tts_batch(texts: List[str], wav_outs: List[str]) -> List[Tuple[float, List[Tuple[str,float]]]]:
+    """Tüm cümleler tek event loop'ta eşzamanlı sentezlenir (ağ gecikmesi baskın) ve geldikçe wav'a dönüştürülür;
+    kalan kontrol/fallback thread havuzunda, davranış tts_to_wav ile aynı."""
     import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    voice, rate_env = _tts_voice_rate()
+    atempo = _rate_to_atempo(rate_env, default=1.08)
+    texts = [(t or "").strip() for t in texts]
+
+    async def _gather():
+        sem = asyncio.Semaphore(TTS_CONCURRENCY)
+        async def _one(t, w):
+            async with sem:
+                return await _edge_stream_tts_async(t, voice, rate_env, w, atempo)
+        jobs = [_one(t, w) for t, w in zip(texts, wav_outs) if t]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    try:
+        got = iter(_run_async(_gather))
+        prefetched = [next(got) if t else None for t in texts]
+    except Exception as e:
+        print(f"⚠️ edge-tts batch fail: {e}")
+        prefetched = [None] * len(texts)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(texts), TTS_CONCURRENCY))) as ex:
+        return list(ex.map(tts_to_wav, texts, wav_outs, prefetched))
+
+def tts_to_wav(text: str, wav_out: str, prefetched=None) -> Tuple[float, List[Tuple[str,float]]]:
+    """prefetched: tts_batch'in getirdiği (mp3_bytes, marks) — wav_out zaten yazılmış — ya da yakaladığı istisna."""
     from aiohttp.client_exceptions import WSServerHandshakeError
     text = (text or "").strip()
     if not text:
-        run(["ffmpeg","-y","-f","lavfi","-t","0.8","-i","anullsrc=r=48000:cl=mono", wav_out])
+        _write_silence_wav(wav_out, 0.8)
         return 0.8, []
-    mp3 = wav_out.replace(".wav", ".mp3")
-    rate_env = os.getenv("TTS_RATE", "+12%")
+    selected_voice, rate_env = _tts_voice_rate()
     atempo = _rate_to_atempo(rate_env, default=1.08)
-    available = VOICE_OPTIONS.get(LANG, ["en-US-JennyNeural"])
-    selected_voice = VOICE if VOICE in available else available[0]
     marks: List[Dict[str,Any]] = []
     try:
-        marks = _edge_stream_tts(text, selected_voice, rate_env, mp3)
-        tmp = wav_out + ".tmp.wav"
-        run([
-            "ffmpeg","-y","-hide_banner","-loglevel","error",
-            "-i", mp3,
-            "-ar","48000","-ac","1","-acodec","pcm_s16le",
-            tmp
-        ])
-        pathlib.Path(mp3).unlink(missing_ok=True)
-        _trim_silence_and_norm(tmp, wav_out, atempo)
-        pathlib.Path(tmp).unlink(missing_ok=True)
+        res = prefetched if prefetched is not None else \
+            _run_async(lambda: _edge_stream_tts_async(text, selected_voice, rate_env, wav_out, atempo))
+        if isinstance(res, BaseException):
+            raise res
+        audio, marks = res
         dur = ffprobe_dur(wav_out) or 0.0
         words = _merge_marks_to_words(text, marks, dur)
         # Güvenlik: Segment çok kısa dönerse bir kez daha (yavaşlat) dene
         if dur < 1.2:
-            _trim_silence_and_norm(wav_out, wav_out, max(0.85, atempo*0.92))
+            _trim_silence_and_norm(audio, wav_out, max(0.85, atempo*0.92))
             dur = ffprobe_dur(wav_out) or dur
             words = _merge_marks_to_words(text, marks, dur)
         return dur, words
@@ -666,27 +1107,16 @@ def tts_to_wav(text: str, wav_out: str) -> Tuple[float, List[Tuple[str,float]]]:
     except Exception as e:
         print(f"⚠️ edge-tts stream fail: {e}")
 
-    # Fallback 1: edge save
+    # Fallback 1: edge (marksız, tek parça) — mp3 diske yazılmaz, baytlar ffmpeg stdin'ine verilir
     try:
         async def _edge_save_simple():
             comm = edge_tts.Communicate(text, voice=selected_voice, rate=rate_env)
-            await comm.save(mp3)
-        try:
-            asyncio.run(_edge_save_simple())
-        except RuntimeError:
-            nest_asyncio.apply()
-            loop = asyncio.get_event_loop()
-            loop.run_until_complete(_edge_save_simple())
-        tmp = wav_out + ".tmp.wav"
-        run([
-            "ffmpeg","-y","-hide_banner","-loglevel","error",
-            "-i", mp3,
-            "-ar","48000","-ac","1","-acodec","pcm_s16le",
-            tmp
-        ])
-        pathlib.Path(mp3).unlink(missing_ok=True)
-        _trim_silence_and_norm(tmp, wav_out, atempo)
-        pathlib.Path(tmp).unlink(missing_ok=True)
+            buf = bytearray()
+            async for chunk in comm.stream():
+                if chunk.get("type") == "audio":
+                    buf.extend(chunk.get("data", b""))
+            return bytes(buf)
+        _trim_silence_and_norm(_run_async(_edge_save_simple), wav_out, atempo)
         dur = ffprobe_dur(wav_out) or 0.0
         words = _merge_marks_to_words(text, [], dur)
         return dur, words
@@ -699,24 +1129,14 @@ def tts_to_wav(text: str, wav_out: str) -> Tuple[float, List[Tuple[str,float]]]:
         lang_code = LANG or "en"
         url = f"https://translate.google.com/translate_tts?ie=UTF-8&q={q}&tl={lang_code}&client=tw-ob&ttsspeed=1.0"
         headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers, timeout=30); r.raise_for_status()
-        open(mp3, "wb").write(r.content)
-        tmp = wav_out + ".tmp.wav"
-        run([
-            "ffmpeg","-y","-hide_banner","-loglevel","error",
-            "-i", mp3,
-            "-ar","48000","-ac","1","-acodec","pcm_s16le",
-            tmp
-        ])
-        pathlib.Path(mp3).unlink(missing_ok=True)
-        _trim_silence_and_norm(tmp, wav_out, atempo)
-        pathlib.Path(tmp).unlink(missing_ok=True)
+        r = _HTTP.get(url, headers=headers, timeout=30); r.raise_for_status()
+        _trim_silence_and_norm(r.content, wav_out, atempo)
         dur = ffprobe_dur(wav_out) or 0.0
         words = _merge_marks_to_words(text, [], dur)
         return dur, words
     except Exception as e2:
         print(f"❌ TTS tüm yollar başarısız, sessizlik üretilecek: {e2}")
-        run(["ffmpeg","-y","-f","lavfi","-t","1.2","-i","anullsrc=r=48000:cl=mono", wav_out])
+        _write_silence_wav(wav_out, 1.2)
         return 1.2, []
 
 # ==================== Video helpers ====================
@@ -724,7 +1144,9 @@ def quantize_to_frames(seconds: float, fps: int = TARGET_FPS) -> Tuple[int, floa
     frames = max(2, int(round(seconds * fps)))
     return frames, frames / float(fps)
 
-def make_segment(src: str, dur_s: float, outp: str):
+def make_segment(src: str, dur_s: float, outp: str, threads: int = SEGMENT_THREADS, overlay: str = ""):
+    """overlay (drawtext zinciri) verilirse yazı aynı encode'a katılır ve çıktı kare-kesin kırpılır:
+    ara all-intra dosya + ikinci libx264 geçişi yok (bu durumda final kalite ayarlarıyla encode edilir)."""
     frames, qdur = quantize_to_frames(dur_s, TARGET_FPS)
     fade = max(0.08, min(0.22, qdur/8.0))
     fade_out_st = max(0.0, qdur - fade)
@@ -737,27 +1159,86 @@ def make_segment(src: str, dur_s: float, outp: str):
         f"fade=t=in:st=0:d={fade:.2f},"
         f"fade=t=out:st={fade_out_st:.2f}:d={fade:.2f}"
     )
-    run([
+    if overlay:
+        vf += f",{overlay},trim=start_frame=0:end_frame={frames}"
+        enc = _venc_args(max(16,CRF_VISUAL-3))
+    else:
+        # all-intra ara dosya: her kare keyframe → sonraki kırpmalar stream-copy yapabilir
+        enc = ["-c:v","libx264","-preset","superfast","-crf",str(CRF_VISUAL),
+               "-g","1","-x264-params","keyint=1:scenecut=0"]
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
         "-stream_loop","-1","-t", f"{qdur:.3f}",
         "-i", src,
         "-vf", vf,
         "-r", str(TARGET_FPS), "-vsync","cfr",
         "-an",
-        "-c:v","libx264","-preset","fast","-crf",str(CRF_VISUAL),
+        *enc,
+        "-threads", str(threads),
         "-pix_fmt","yuv420p","-movflags","+faststart",
         outp
     ])
 
-def enforce_video_exact_frames(video_in: str, target_frames: int, outp: str):
+def _remux_exact_frames(video_in: str, target_frames: int, outp: str) -> bool:
+    """Yeniden encode gerekmeyen durumlar: girdi zaten TARGET_FPS'te ve tam target_frames kare → dosya kopyası;
+    fazlaysa ve B-kare yoksa (çözüm sırası = gösterim sırası) ilk target_frames paket stream-copy ile alınır."""
+    import shutil
+    try:
+        out = run(["ffprobe","-v","error","-select_streams","v:0",
+                   "-show_entries","stream=nb_frames,r_frame_rate,has_b_frames","-of","json", video_in]).stdout
+        st = (_json_loads(out).get("streams") or [{}])[0]
+        num, _, den = str(st.get("r_frame_rate", "0/1")).partition("/")
+        fps_ok = abs(float(num) / float(den or 1) - TARGET_FPS) < 1e-6
+        n = int(st.get("nb_frames") or 0)
+    except Exception:
+        return False
+    if not fps_ok or n <= 0 or n < target_frames:
+        return False
+    if n == target_frames:
+        shutil.copyfile(video_in, outp)
+        return True
+    if int(st.get("has_b_frames") or 0) != 0:
+        return False
+    run_fast([
+        "ffmpeg","-y","-hide_banner","-loglevel","error",
+        "-i", video_in,
+        "-frames:v", str(target_frames),
+        "-an","-c:v","copy","-movflags","+faststart",
+        "-avoid_negative_ts","make_zero",
+        outp
+    ])
+    return True
+
+def enforce_video_exact_frames(video_in: str, target_frames: int, outp: str, threads: int = 0, stream_copy: bool = False,
+                               pad_sec: float = 0.0, post_vf: str = "", intermediate: bool = False):
+    """stream_copy=True: girdi TARGET_FPS'te all-intra ise (make_segment çıktısı) yeniden encode etmeden kırp.
+    pad_sec > 0: video sesten kısaysa son kare aynı encode içinde (tpad) uzatılır — ayrı pad encode'u yok.
+    post_vf: kırpılmış (t=0'dan başlayan) görüntüye aynı encode'da uygulanacak ek filtreler (ör. CTA drawtext).
+    intermediate=True: girdi superfast all-intra ara dosya → remux kısayolu yok, teslim ayarlarıyla encode edilir."""
     target_frames = max(2, int(target_frames))
+    if stream_copy:
+        run_fast([
+            "ffmpeg","-y","-hide_banner","-loglevel","error",
+            "-i", video_in,
+            "-frames:v", str(target_frames),
+            "-an","-c:v","copy","-movflags","+faststart",
+            outp
+        ])
+        return
+    if pad_sec <= 0 and not post_vf and not intermediate and _remux_exact_frames(video_in, target_frames, outp):
+        return
     vf = f"fps={TARGET_FPS},setpts=N/{TARGET_FPS}/TB,trim=start_frame=0:end_frame={target_frames}"
-    run([
+    if pad_sec > 0:
+        vf = f"tpad=stop_mode=clone:stop_duration={pad_sec:.3f}," + vf
+    if post_vf:
+        vf += "," + post_vf
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
         "-i", video_in,
         "-vf", vf,
         "-r", str(TARGET_FPS), "-vsync","cfr",
-        "-c:v","libx264","-preset","medium","-crf",str(CRF_VISUAL),
+        *_venc_args(CRF_VISUAL),
+        "-threads", str(threads),
         "-pix_fmt","yuv420p","-movflags","+faststart",
         outp
     ])
@@ -767,15 +1248,17 @@ def _ass_time(s: float) -> str:
     m = int(s//60); s -= m*60
     return f"{h:d}:{m:02d}:{s:05.2f}"
 
-def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]], is_hook: bool) -> str:
-    # (aynı – değişmedi)
-    def _to_ass(c: str) -> str:
-        c = c.strip()
-        if c.startswith("0x"): c = c[2:]
-        if c.startswith("#"):  c = c[1:]
-        if len(c) == 6:        c = "00" + c
-        rr, gg, bb = c[-6:-4], c[-4:-2], c[-2:]
-        return f"&H00{bb}{gg}{rr}"
+def _ass_color(c: str) -> str:
+    c = c.strip()
+    if c.startswith("0x"): c = c[2:]
+    if c.startswith("#"):  c = c[1:]
+    if len(c) == 6:        c = "00" + c
+    rr, gg, bb = c[-6:-4], c[-4:-2], c[-2:]
+    return f"&H00{bb}{gg}{rr}"
+
+@functools.lru_cache(maxsize=2)
+def _ass_header(is_hook: bool) -> Tuple[str, int, int]:
+    """[Script Info]/[V4+ Styles]/[Events] başlığı çalışma boyunca sabit → (header, margin_v, outline) bir kez kurulur."""
     fontname = "DejaVu Sans"
     if VIDEO_W > VIDEO_H:
         fontsize = 44 if is_hook else 40
@@ -784,7 +1267,23 @@ def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]],
         fontsize = 58 if is_hook else 52
         margin_v = int(VIDEO_H * (0.14 if is_hook else 0.17))
     outline  = 4  if is_hook else 3
-    words_upper = [(re.sub(r"\s+", " ", w.upper()), d) for w, d in words if str(w).strip()]
+    header = f"""[Script Info]
+ScriptType: v4.00+
+PlayResX: {VIDEO_W}
+PlayResY: {VIDEO_H}
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Base,{fontname},{fontsize},{_ass_color(KARAOKE_INACTIVE)},{_ass_color(KARAOKE_ACTIVE)},{_ass_color(KARAOKE_OUTLINE)},&H7F000000,1,0,0,0,100,100,0,0,1,{outline},0,2,50,50,{margin_v},0
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+    return header, margin_v, outline
+
+def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]], is_hook: bool) -> str:
+    header, margin_v, outline = _ass_header(is_hook)
+    words_upper = [(_RE_WS.sub(" ", w.upper()), d) for w, d in words if str(w).strip()]
     if not words_upper:
         words_upper = [(w.upper(), 0.5) for w in (text or "…").split()]
     n = len(words_upper)
@@ -793,17 +1292,17 @@ def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]],
     if sum(ds) == 0:
         ds = [50] * n
     try:
-        speedup_pct = float(os.getenv("KARAOKE_SPEEDUP_PCT", "3.0"))
+        speedup_pct = float(_ENV.get("KARAOKE_SPEEDUP_PCT", "3.0"))
     except Exception:
         speedup_pct = 1.5
     speedup_pct = max(-5.0, min(5.0, speedup_pct))
     try:
-        early_end_ms = int(os.getenv("KARAOKE_EARLY_END_MS", "80"))
+        early_end_ms = int(_ENV.get("KARAOKE_EARLY_END_MS", "80"))
     except Exception:
         early_end_ms = 80
     early_end_cs = max(0, int(round(early_end_ms / 10.0)))
     try:
-        ramp_pct = float(os.getenv("KARAOKE_RAMP_PCT", "1.0"))
+        ramp_pct = float(_ENV.get("KARAOKE_RAMP_PCT", "1.0"))
     except Exception:
         ramp_pct = 1.0
     ramp_pct = max(0.0, min(5.0, ramp_pct))
@@ -827,7 +1326,7 @@ def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]],
         ds[i % n] += 1
         i += 1
     try:
-        lead_ms = int(os.getenv("CAPTION_LEAD_MS", os.getenv("KARAOKE_LEAD_MS", "0")))
+        lead_ms = int(_ENV.get("CAPTION_LEAD_MS", _ENV.get("KARAOKE_LEAD_MS", "0")))
     except Exception:
         lead_ms = 0
     lead_cs_target = max(0, int(round(lead_ms / 10.0)))
@@ -847,30 +1346,15 @@ def _build_karaoke_ass(text: str, seg_dur: float, words: List[Tuple[str,float]],
             ds[-1] += add_b
         else:
             ds[-1] += removed
-    cap = " ".join([w for w, _ in words_upper])
-    _ = wrap_mobile_lines(cap, max_line_length=CAPTION_MAX_LINE, max_lines=3).replace("\n", "\\N")
     kline = "".join([f"{{\\k{ds[i]}}}{words_upper[i][0]} " for i in range(n)]).strip()
-    ass = f"""[Script Info]
-ScriptType: v4.00+
-PlayResX: {VIDEO_W}
-PlayResY: {VIDEO_H}
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Base,{fontname},{fontsize},{_to_ass(KARAOKE_INACTIVE)},{_to_ass(KARAOKE_ACTIVE)},{_to_ass(KARAOKE_OUTLINE)},&H7F000000,1,0,0,0,100,100,0,0,1,{outline},0,2,50,50,{margin_v},0
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-Dialogue: 0,0:00:00.00,{_ass_time(seg_dur)},Base,,0,0,{margin_v},,{{\\bord{outline}\\shad0}}{kline}
-"""
-    return ass
+    return header + f"Dialogue: 0,0:00:00.00,{_ass_time(seg_dur)},Base,,0,0,{margin_v},,{{\\bord{outline}\\shad0}}{kline}\n"
 
 def _derive_info_line(raw: str) -> str:
     """Altyazı yerine ekrana kısa bilgi satırı. 'Scene 1/2..' vb temizlenir."""
     s = normalize_sentence(raw)
-    s = re.sub(r"(?i)\bscene\s+\d+\b[:\-]?\s*", "", s).strip()
+    s = _RE_SCENE_TAG.sub("", s).strip()
     # İlk cümle/ya da 12–14 kelime
-    first = re.split(r"[.!?]", s)[0].strip() or s
+    first = _RE_SENT_SPLIT.split(s, 1)[0].strip() or s
     words = first.split()
     if len(words) > 14:
         first = " ".join(words[:14]).rstrip(",;:") + "…"
@@ -879,11 +1363,8 @@ def _derive_info_line(raw: str) -> str:
         first = first[0].upper() + first[1:]
     return first
 
-def draw_capcut_text(seg: str, text: str, color: str, font: str, outp: str, is_hook: bool=False, words: Optional[List[Tuple[str,float]]]=None):
-    """Bilgi kartı modu: karaoke kapalı; drawtext ile 3–5 sn görünür overlay."""
-    seg_dur = ffprobe_dur(seg)
-    frames = max(2, int(round(seg_dur * TARGET_FPS)))
-
+def _info_overlay_vf(text: str, color: str, font: str, seg_dur: float, tf: str, is_hook: bool = False) -> str:
+    """Bilgi kartı drawtext zinciri (gölge + kutu + metin); metin tf'ye yazılır. drawtext yoksa/metin boşsa ""."""
     # Bilgi kartı metni
     info_text = _derive_info_line(text) if INFO_OVERLAYS_ENABLE else clean_caption_text(text).upper()
     show_dur = min(max(OVERLAY_MIN_SEC, seg_dur * 0.55), min(OVERLAY_MAX_SEC, seg_dur - 0.2))
@@ -892,7 +1373,6 @@ def draw_capcut_text(seg: str, text: str, color: str, font: str, outp: str, is_h
 
     if _HAS_DRAWTEXT and info_text:
         wrapped = wrap_mobile_lines(info_text, CAPTION_MAX_LINE, min(3, CAPTION_MAX_LINES))
-        tf = str(pathlib.Path(seg).with_suffix(".caption.txt"))
         pathlib.Path(tf).write_text(wrapped, encoding="utf-8")
         lines = wrapped.split("\n")
         n_lines = max(1, len(lines))
@@ -917,71 +1397,95 @@ def draw_capcut_text(seg: str, text: str, color: str, font: str, outp: str, is_h
         shadow = f"drawtext={common}{font_arg}:fontcolor=black@0.86:borderw=0:enable='{enable_expr}'"
         box    = f"drawtext={common}{font_arg}:fontcolor=white@0.0:box=1:boxborderw={(18 if is_hook else 16)}:boxcolor=black@0.62:enable='{enable_expr}'"
         main   = f"drawtext={common}{font_arg}:fontcolor={col}:borderw={(5 if is_hook else 4)}:bordercolor=black@0.9:enable='{enable_expr}'"
+        return f"{shadow},{box},{main}"
+    return ""
 
-        vf_overlay = f"{shadow},{box},{main}"
+def draw_capcut_text(seg: str, text: str, color: str, font: str, outp: str, is_hook: bool=False, words: Optional[List[Tuple[str,float]]]=None,
+                     threads: int = SEGMENT_THREADS):
+    """Bilgi kartı modu: karaoke kapalı; drawtext ile 3–5 sn görünür overlay."""
+    seg_dur = ffprobe_dur(seg)
+    frames = max(2, int(round(seg_dur * TARGET_FPS)))
+    tf = str(pathlib.Path(seg).with_suffix(".caption.txt"))
+    vf_overlay = _info_overlay_vf(text, color, font, seg_dur, tf, is_hook)
+    if vf_overlay:
         vf = f"{vf_overlay},fps={TARGET_FPS},setpts=N/{TARGET_FPS}/TB,trim=start_frame=0:end_frame={frames}"
-        tmp_out = str(pathlib.Path(outp).with_suffix(".tmp.mp4"))
+        # vf zaten fps+setpts+trim içeriyor → kare-kesin çıktı tek encode ile
         try:
-            run([
+            run_fast([
                 "ffmpeg","-y","-hide_banner","-loglevel","error",
                 "-i", seg, "-vf", vf,
                 "-r", str(TARGET_FPS), "-vsync","cfr",
                 "-an",
-                "-c:v","libx264","-preset","medium","-crf",str(max(16,CRF_VISUAL-3)),
-                "-pix_fmt","yuv420p","-movflags","+faststart", tmp_out
+                *_venc_args(max(16,CRF_VISUAL-3)),
+                "-threads", str(threads),
+                "-pix_fmt","yuv420p","-movflags","+faststart", outp
             ])
-            enforce_video_exact_frames(tmp_out, frames, outp)
         finally:
             pathlib.Path(tf).unlink(missing_ok=True)
-            pathlib.Path(tmp_out).unlink(missing_ok=True)
         return
 
     if REQUIRE_CAPTIONS:
         raise RuntimeError("Captions required but 'drawtext' yok.")
-    enforce_video_exact_frames(seg, frames, outp)
+    enforce_video_exact_frames(seg, frames, outp, threads=threads, stream_copy=True)
 
-def pad_video_to_duration(video_in: str, target_sec: float, outp: str):
-    vdur = ffprobe_dur(video_in)
-    if vdur >= target_sec - 0.02:
-        pathlib.Path(outp).write_bytes(pathlib.Path(video_in).read_bytes())
-        return
-    extra = max(0.0, target_sec - vdur)
-    run([
-        "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-i", video_in,
-        "-filter_complex", f"[0:v]tpad=stop_mode=clone:stop_duration={extra:.3f},fps={TARGET_FPS},setpts=N/{TARGET_FPS}/TB[v]",
-        "-map","[v]",
-        "-r", str(TARGET_FPS), "-vsync","cfr",
-        "-c:v","libx264","-preset","medium","-crf",str(CRF_VISUAL),
-        "-pix_fmt","yuv420p","-movflags","+faststart",
-        outp
-    ])
+def _video_stream_sig(p: str) -> str:
+    # codec + geometri + zaman tabanı + SPS/PPS (extradata) özeti; eşitse bitstream'ler birleştirilebilir
+    try:
+        return run(["ffprobe","-v","error","-select_streams","v:0","-show_data_hash","md5",
+                    "-show_entries","stream=codec_name,profile,level,width,height,pix_fmt,r_frame_rate,time_base,extradata_hash",
+                    "-of","csv=p=0", p]).stdout.strip()
+    except Exception:
+        return f"?{p}"  # prob başarısız → eşleşmez, filter yoluna düşülür
+
+def _concat_videos_copy(files: List[str], outp: str) -> bool:
+    if len({_video_stream_sig(p) for p in files}) != 1:
+        return False
+    lst = str(pathlib.Path(outp).with_suffix(".concat.txt"))
+    pathlib.Path(lst).write_text(
+        "".join("file '" + str(pathlib.Path(p).resolve()).replace("'", "'\\''") + "'\n" for p in files),
+        encoding="utf-8")
+    try:
+        run_fast([
+            "ffmpeg","-y","-hide_banner","-loglevel","error",
+            "-f","concat","-safe","0","-i", lst,
+            "-an","-c:v","copy","-movflags","+faststart",
+            outp
+        ])
+        return True
+    except Exception as e:
+        print(f"⚠️ concat copy failed, re-encoding: {e}")
+        return False
+    finally:
+        pathlib.Path(lst).unlink(missing_ok=True)
 
-def concat_videos_filter(files: List[str], outp: str):
+def concat_videos_filter(files: List[str], outp: str) -> bool:
+    """True: girdiler yeniden encode edilmeden birleştirildi (bitstream girdilerinkiyle aynı)."""
     if not files: raise RuntimeError("concat_videos_filter: empty")
+    if VIDEO_CONCAT_COPY and _concat_videos_copy(files, outp):
+        return True
     inputs = []; filters = []
     for i, p in enumerate(files):
         inputs += ["-i", p]
         filters.append(f"[{i}:v]fps={TARGET_FPS},settb=AVTB,setpts=N/{TARGET_FPS}/TB[v{i}]")
     filtergraph = ";".join(filters) + ";" + "".join(f"[v{i}]" for i in range(len(files))) + f"concat=n={len(files)}:v=1:a=0[v]"
-    run([
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
         *inputs,
         "-filter_complex", filtergraph,
         "-map","[v]",
         "-r", str(TARGET_FPS), "-vsync","cfr",
-        "-c:v","libx264","-preset","medium","-crf",str(CRF_VISUAL),
+        *_venc_args(CRF_VISUAL),
         "-pix_fmt","yuv420p","-movflags","+faststart",
         outp
     ])
+    return False
 
-def overlay_cta_tail(video_in: str, text: str, outp: str, show_sec: float, font: str):
-    vdur = ffprobe_dur(video_in)
+def _cta_tail_vf(text: str, vdur: float, show_sec: float, font: str, tf: str) -> str:
+    """Son show_sec saniyede görünen CTA drawtext zinciri (kutu + metin); metin tf'ye yazılır.
+    Kare kilitleme encode'una eklenir → CTA için ayrı tam-video encode'u yok."""
     if vdur <= 0.1 or not text.strip():
-        pathlib.Path(outp).write_bytes(pathlib.Path(video_in).read_bytes())
-        return
+        return ""
     t0 = max(0.0, vdur - max(0.8, show_sec))
-    tf = str(pathlib.Path(outp).with_suffix(".cta.txt"))
     wrapped = wrap_mobile_lines(text.upper(), max_line_length=26, max_lines=3)
     pathlib.Path(tf).write_text(wrapped, encoding="utf-8")
     font_arg = f":fontfile={_ff_sanitize_font(font)}" if font else ""
@@ -990,22 +1494,22 @@ def overlay_cta_tail(video_in: str, text: str, outp: str, show_sec: float, font:
     common = f"textfile='{tf_ff}':fontsize=52:x=(w-text_w)/2:y=h*{y_frac}:line_spacing=10"
     box    = f"drawtext={common}{font_arg}:fontcolor=white@0.0:box=1:boxborderw=18:boxcolor=black@0.55:enable='gte(t,{t0:.3f})'"
     main   = f"drawtext={common}{font_arg}:fontcolor={_ff_color('#3EA6FF')}:borderw=5:bordercolor=black@0.9:enable='gte(t,{t0:.3f})'"
-    vf     = f"{box},{main},fps={TARGET_FPS},setpts=N/{TARGET_FPS}/TB"
-    run([
-        "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-i", video_in, "-vf", vf,
-        "-r", str(TARGET_FPS), "-vsync","cfr",
-        "-an","-c:v","libx264","-preset","medium","-crf",str(CRF_VISUAL),
-        "-pix_fmt","yuv420p","-movflags","+faststart", outp
-    ])
-    pathlib.Path(tf).unlink(missing_ok=True)
+    return f"{box},{main}"
 
 # ==================== Audio concat (lossless) ====================
+AUDIO_NORM = "dynaudnorm=g=7:f=250"
+
 def concat_audios(files: List[str], outp: str):
-    """0.2 sn acrossfade ile araları pürüzsüz birleştir (uzun sessizlik yok)."""
+    """0.2 sn acrossfade ile araları pürüzsüz birleştir (uzun sessizlik yok); dynaudnorm tüm ses üzerinde bir kez."""
     if not files: raise RuntimeError("concat_audios: empty file list")
     if len(files) == 1:
-        shutil.copyfile(files[0], outp); return
+        run_fast([
+            "ffmpeg","-y","-hide_banner","-loglevel","error",
+            "-i", files[0], "-af", AUDIO_NORM,
+            "-ar","48000","-ac","1","-c:a","pcm_s16le",
+            outp
+        ])
+        return
     inputs=[]; maps=[]
     for i,f in enumerate(files):
         inputs += ["-i", f]
@@ -1020,8 +1524,8 @@ def concat_audios(files: List[str], outp: str):
         out = f"[m{i}]"
         graph += f"{cur}{nxt}acrossfade=d=0.20:c1=tri:c2=tri{out};"
         cur = out
-    graph += f"{cur}[mix]"
-    run([
+    graph += f"{cur}{AUDIO_NORM}[mix]"
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
         *inputs,
         "-filter_complex", graph,
@@ -1031,9 +1535,27 @@ def concat_audios(files: List[str], outp: str):
         outp
     ])
 
+def _wav_truncate(audio_in: str, outp: str, dur: float) -> bool:
+    """48k mono s16 PCM WAV'ı ham veri üzerinden kırpar (başlık yeniden yazılır); ffmpeg süreci/yeniden örnekleme yok.
+    Biçim farklıysa False → ffmpeg yolu."""
+    import wave
+    try:
+        with wave.open(audio_in, "rb") as r:
+            if (r.getnchannels(), r.getsampwidth(), r.getframerate(), r.getcomptype()) != (1, 2, 48000, "NONE"):
+                return False
+            data = r.readframes(min(r.getnframes(), int(round(dur * 48000))))
+        with wave.open(outp, "wb") as w:
+            w.setnchannels(1); w.setsampwidth(2); w.setframerate(48000)
+            w.writeframes(data)
+        return True
+    except Exception:
+        return False
+
 def lock_audio_duration(audio_in: str, target_frames: int, outp: str):
     dur = target_frames / float(TARGET_FPS)
-    run([
+    if _wav_truncate(audio_in, outp, dur):
+        return
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
         "-i", audio_in,
         "-af", f"atrim=end={dur:.6f},asetpts=N/SR/TB",
@@ -1042,11 +1564,25 @@ def lock_audio_duration(audio_in: str, target_frames: int, outp: str):
         outp
     ])
 
-def mux(video: str, audio: str, outp: str):
-    run([
+def mux(video: str, audio: str, outp: str, bgm: Optional[str] = None, frames: Optional[int] = None):
+    """bgm verilirse: döngü + fade + sidechain ducking + kare-kesin süre kilidi mux ile aynı ffmpeg çağrısında
+    (bgm_loop / audio_with_bgm / *_exact ara WAV'ları ve üç ayrı ses geçişi yok)."""
+    inputs = ["-i", video, "-i", audio]
+    amap = ["-map","1:a:0"]
+    if bgm:
+        frames = max(2, int(frames or 0))
+        dur = frames / float(TARGET_FPS)
+        fade = max(0.3, float(BGM_FADE))
+        endst = max(0.0, dur - fade)
+        inputs += ["-stream_loop","-1","-t", f"{dur:.3f}", "-i", bgm]
+        graph = (f"[2:a]afade=t=in:st=0:d={fade:.2f},afade=t=out:st={endst:.2f}:d={fade:.2f},aresample=48000[bg];"
+                 + _duck_graph("[1:a]", "[bg]")
+                 + f",atrim=end={dur:.6f},asetpts=N/SR/TB[a]")
+        amap = ["-filter_complex", graph, "-map","[a]", "-ar","48000","-ac","1"]
+    run_fast([
         "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-i", video, "-i", audio,
-        "-map","0:v:0","-map","1:a:0",
+        *inputs,
+        "-map","0:v:0", *amap,
         "-c:v","copy",
         "-c:a","aac","-b:a","256k",
         "-movflags","+faststart",
@@ -1107,39 +1643,67 @@ BANNED_PHRASES = [
     "soap-opera narration","repeat once","takeaway action",
     "in 60 seconds","just the point","crisp beats"
 ]
+# tek geçişte tüm yasaklı ifadeler (alt-dize semantiği korunur, \b yok)
+_BANNED_RE = re.compile("|".join(re.escape(p) for p in BANNED_PHRASES))
 
 def _content_score(sentences: List[str]) -> float:
     if not sentences: return 0.0
     bad = 0
     for s in sentences:
         low = (s or "").lower()
-        if any(bp in low for bp in BANNED_PHRASES): bad += 1
+        if _BANNED_RE.search(low): bad += 1
         if len(low.split()) < 5: bad += 0.5
     return max(0.0, 10.0 - (bad * 1.4))
 
 def _gemini_call(prompt: str, model: str, temp: float) -> dict:
     if not GEMINI_API_KEY: raise RuntimeError("GEMINI_API_KEY missing")
+    if GEMINI_DISK_CACHE_TTL > 0:
+        ck = _DiskCache.key("gemini", prompt, model, round(temp, 3))
+        hit = _DISK_CACHE.get(ck)
+        if isinstance(hit, dict):
+            return hit
+        out = _gemini_call_raw(prompt, model, temp)
+        _DISK_CACHE.set(ck, out, GEMINI_DISK_CACHE_TTL)
+        return out
+    return _gemini_call_raw(prompt, model, temp)
+
+def _gemini_call_raw(prompt: str, model: str, temp: float) -> dict:
     headers = {"Content-Type":"application/json","x-goog-api-key":GEMINI_API_KEY}
     payload = {"contents":[{"parts":[{"text": prompt}]}],
                "generationConfig":{"temperature":temp}}
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
+    r = _HTTP.post(url, headers=headers, json=payload, timeout=60)
     if r.status_code != 200:
         raise RuntimeError(f"Gemini HTTP {r.status_code}: {r.text[:300]}")
-    data = r.json()
+    data = _json_loads(r.content)
     txt = ""
     try: txt = data["candidates"][0]["content"]["parts"][0]["text"]
     except Exception: txt = json.dumps(data)
-    m = re.search(r"\{(?:.|\n)*\}", txt)
+    m = _RE_JSON_OBJ.search(txt)
     if not m: raise RuntimeError("Gemini response parse error (no JSON)")
-    raw = re.sub(r"^```json\s*|\s*```$", "", m.group(0).strip(), flags=re.MULTILINE)
-    return json.loads(raw)
+    raw = _RE_JSON_FENCE.sub("", m.group(0).strip())
+    return _json_loads(raw)
+
+def _gemini_call_best(prompt: str, model: str, temp: float, n: int) -> dict:
+    """n sıcaklık varyantını eşzamanlı gönder; başarılı yanıtlardan _content_score'u en yüksek olanı döndür."""
+    from concurrent.futures import ThreadPoolExecutor
+    offsets = [0.0] + [d * k for k in range(1, n) for d in (0.1, -0.1)]
+    temps = [max(0.6, min(1.2, temp + o)) for o in offsets[:n]]
+    def _try(t):
+        try: return _gemini_call(prompt, model, t)
+        except Exception as e: return e
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        results = list(ex.map(_try, temps))
+    good = [d for d in results if isinstance(d, dict)]
+    if not good:
+        raise results[0]
+    return max(good, key=lambda d: _content_score([clean_caption_text(s) for s in (d.get("sentences") or [])]))
 
 def _terms_normalize(terms: List[str]) -> List[str]:
     out=[]; seen=set()
     BAD={"great","nice","good","bad","things","stuff","concept","concepts","idea","ideas"}
     for t in terms or []:
-        tt = re.sub(r"[^A-Za-z0-9 ]+"," ", str(t)).strip().lower()
+        tt = _RE_NONALNUM_SPC.sub(" ", str(t)).strip().lower()
         tt = " ".join([w for w in tt.split() if w and len(w)>2 and w not in BAD])[:64]
         if not tt: continue
         if tt not in seen:
@@ -1149,8 +1713,7 @@ def _terms_normalize(terms: List[str]) -> List[str]:
 def _derive_terms_from_text(topic: str, sentences: List[str]) -> List[str]:
     pool=set()
     def tok(s):
-        s=re.sub(r"[^A-Za-z0-9 ]+"," ", s.lower())
-        return [w for w in s.split() if len(w)>3]
+        return _RE_TOKEN4.findall(s.lower())
     for s in [topic] + sentences:
         ws=tok(s or "")
         for i in range(len(ws)-1):
@@ -1158,32 +1721,41 @@ def _derive_terms_from_text(topic: str, sentences: List[str]) -> List[str]:
     base=list(pool); random.shuffle(base)
     return _terms_normalize(base)[:8]
 
-def build_via_gemini(channel_name: str, topic_lock: str, user_terms: List[str], banlist: List[str]) -> Tuple[str,List[str],List[str],str,str,List[str]]:
-    tpl_key = _select_template_key(topic_lock)
-    template = (LONGFORM_TEMPLATES if LONGFORM else ENHANCED_GEMINI_TEMPLATES)[tpl_key]
-    avoid = "\n".join(f"- {b}" for b in banlist[:15]) if banlist else "(none)"
-    terms_hint = ", ".join(user_terms[:10]) if user_terms else "(none)"
-    extra = (("\nADDITIONAL STYLE:\n"+GEMINI_PROMPT) if GEMINI_PROMPT else "")
-    guardrails = """
+# Prompt'un sabit kısımları bir kez kurulur; retry başına yalnızca terms/banlist kısmı değişir
+_GEMINI_GUARDRAILS = """
 RULES (MANDATORY):
 - STAY ON TOPIC exactly as provided.
-- Return ONLY JSON, no prose/markdown, keys: topic, sentences, search_terms, title, description, tags."""
+- Return ONLY JSON, no prose/markdown, keys: topic, sentences, search_terms, per_scene_queries, title, description, tags.
+- per_scene_queries: exactly one short (2–4 words) concrete English stock-footage query per sentence, same order and count as sentences."""
+_GEMINI_PROMPT_TAIL = (("\nADDITIONAL STYLE:\n"+GEMINI_PROMPT) if GEMINI_PROMPT else "") + "\n" + _GEMINI_GUARDRAILS + "\n"
+
+@functools.lru_cache(maxsize=32)
+def _gemini_prompt_head(channel_name: str, topic_lock: str) -> str:
+    template = (LONGFORM_TEMPLATES if LONGFORM else ENHANCED_GEMINI_TEMPLATES)[_select_template_key(topic_lock)]
+    return f"{template}\n\nChannel: {channel_name}\nLanguage: {LANG}\nTOPIC (hard lock): {topic_lock}\n"
+
+def build_via_gemini(channel_name: str, topic_lock: str, user_terms: List[str], banlist: List[str]) -> Tuple[str,List[str],List[str],str,str,List[str],List[str]]:
+    avoid = "\n".join(f"- {b}" for b in banlist[:15]) if banlist else "(none)"
+    terms_hint = ", ".join(user_terms[:10]) if user_terms else "(none)"
     jitter = ((ROTATION_SEED or int(time.time())) % 13) * 0.01
     temp = max(0.6, min(1.2, GEMINI_TEMP + (jitter - 0.06)))
-    prompt = f"""{template}
-
-Channel: {channel_name}
-Language: {LANG}
-TOPIC (hard lock): {topic_lock}
-Seed search terms (use and expand): {terms_hint}
-Avoid overlap for 180 days:
-{avoid}{extra}
-{guardrails}
-"""
-    data = _gemini_call(prompt, GEMINI_MODEL, temp)
+    prompt = (f"{_gemini_prompt_head(channel_name, topic_lock)}"
+              f"Seed search terms (use and expand): {terms_hint}\n"
+              f"Avoid overlap for 180 days:\n{avoid}{_GEMINI_PROMPT_TAIL}")
+    if GEMINI_PARALLEL > 1:
+        data = _gemini_call_best(prompt, GEMINI_MODEL, temp, GEMINI_PARALLEL)
+    else:
+        data = _gemini_call(prompt, GEMINI_MODEL, temp)
     topic   = topic_lock
-    sentences = [clean_caption_text(s) for s in (data.get("sentences") or [])]
-    sentences = [s for s in sentences if s][: (16 if LONGFORM else 8)]
+    cleaned = [clean_caption_text(s) for s in (data.get("sentences") or [])]
+    keep = [i for i, s in enumerate(cleaned) if s][: (16 if LONGFORM else 8)]
+    sentences = [cleaned[i] for i in keep]
+    # Sahne başına sorgular aynı yanıttan; sayı tutmuyorsa/boşsa build_per_scene_queries'e düşülür
+    psq = data.get("per_scene_queries")
+    scene_q: List[str] = []
+    if isinstance(psq, list) and len(psq) == len(cleaned):
+        scene_q = [_simplify_query(str(psq[i] or ""), keep=4) for i in keep]
+        if not all(scene_q): scene_q = []
     terms = data.get("search_terms") or []
     if isinstance(terms, str): terms=[terms]
     terms = _terms_normalize(terms)
@@ -1194,14 +1766,15 @@ Avoid overlap for 180 days:
     title = (data.get("title") or "").strip()
     desc  = (data.get("description") or "").strip()
     tags  = [t.strip() for t in (data.get("tags") or []) if isinstance(t,str) and t.strip()]
-    return topic, sentences, terms, title, desc, tags
+    return topic, sentences, terms, title, desc, tags, scene_q
 
 # ===== Ek: Süre yetersizse ek sahne üret =====
-AUTO_EXTEND_TO_MIN = (os.getenv("AUTO_EXTEND_TO_MIN","1")=="1")
+AUTO_EXTEND_TO_MIN = (_ENV.get("AUTO_EXTEND_TO_MIN","1")=="1")
 def gen_extra_scenes(topic: str, want_sec: float) -> List[str]:
     """Gemini’dan, toplam süreyi yükseltmek için ilave sahneler (kısa paragraflar)."""
     if not (USE_GEMINI and GEMINI_API_KEY):
         return []
+    import math
     approx_scene = 22.0  # 20–25 sn arası
     need = max(3, min(8, int(math.ceil(want_sec/approx_scene))))
     prompt = f"""Return JSON with key 'sentences' ONLY.
@@ -1214,26 +1787,21 @@ Language: {LANG}
     return extra[:need]
 
 # ==================== Per-scene queries (PEXELS) — (değişmedi, ufak temizlik) ====================
-_STOP = set("""
+_STOP = frozenset("""
 a an the and or but if while of to in on at from by with for about into over after before between during under above across around through
 this that these those is are was were be been being have has had do does did can could should would may might will shall
 you your we our they their he she it its as than then so such very more most many much just also only even still yet
 """.split())
-_GENERIC_BAD = {"great","good","bad","big","small","old","new","many","more","most","thing","things","stuff"}
+_GENERIC_BAD = frozenset({"great","good","bad","big","small","old","new","many","more","most","thing","things","stuff"})
+_STOP_ALL = _STOP | _GENERIC_BAD  # token başına tek üyelik testi
 
 def _proper_phrases(texts: List[str]) -> List[str]:
-    phrases=[]
+    seen: Dict[str, None] = {}  # dict: sıralı + tekil (ara liste ve ikinci dedup döngüsü yok)
     for t in texts:
-        for m in re.finditer(r"(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)", t or ""):
-            phrase = re.sub(r"^(The|A|An)\s+", "", m.group(0))
-            ws = [w.lower() for w in phrase.split()]
-            for i in range(len(ws)-1):
-                phrases.append(f"{ws[i]} {ws[i+1]}")
-    seen=set(); out=[]
-    for p in phrases:
-        if p not in seen:
-            seen.add(p); out.append(p)
-    return out
+        for m in _RE_PROPER.finditer(t or ""):
+            ws = _RE_LEAD_ART.sub("", m.group(0)).lower().split()
+            seen.update(dict.fromkeys(f"{a} {b}" for a, b in zip(ws, ws[1:])))
+    return list(seen)
 
 def _domain_synonyms(all_text: str) -> List[str]:
     t = (all_text or "").lower()
@@ -1254,14 +1822,12 @@ def build_per_scene_queries(sentences: List[str], fallback_terms: List[str], top
     texts_all = " ".join([topic] + sentences)
     phrase_pool = _proper_phrases(texts_cap) + _domain_synonyms(texts_all)
     def _tok4(s: str) -> List[str]:
-        s = re.sub(r"[^A-Za-z0-9 ]+", " ", (s or "").lower())
-        toks = [w for w in s.split() if len(w) >= 4 and w not in _STOP and w not in _GENERIC_BAD]
-        return toks
+        return [w for w in _RE_TOKEN4.findall((s or "").lower()) if w not in _STOP_ALL]
     fb=[]
     for t in (fallback_terms or []):
-        t = re.sub(r"[^A-Za-z0-9 ]+"," ", str(t)).strip().lower()
+        t = _RE_NONALNUM_SPC.sub(" ", str(t)).strip().lower()
         if not t: continue
-        ws = [w for w in t.split() if w not in _STOP and w not in _GENERIC_BAD]
+        ws = [w for w in t.split() if w not in _STOP_ALL]
         if ws:
             fb.append(" ".join(ws[:2]))
     topic_keys = _tok4(topic)[:2]
@@ -1281,16 +1847,27 @@ def build_per_scene_queries(sentences: List[str], fallback_terms: List[str], top
         ("ambient", "ambient lighting"),
     ]
     fb_strong = [t for t in (fallback_terms or []) if t]
+    # phrase_pool eşleşmesi: " ph " alt dizgesi ⇔ cümlenin (tek boşlukla bölünmüş) ardışık kelimeleri;
+    # her cümlede n-gram sözlük araması (O(kelime × n)), havuz sırası önceliği korunur
+    ph_rank: Dict[str, int] = {}
+    for i, ph in enumerate(phrase_pool):
+        ph_rank.setdefault(ph, i)
+    ph_maxn = max((ph.count(" ") + 1 for ph in ph_rank), default=0)
     for s in sentences:
         s_low = " " + (s or "").lower() + " "
         picked=None
         for key, val in lex:
             if key in s_low:
                 picked = val; break
-        if not picked:
-            for ph in phrase_pool:
-                if f" {ph} " in s_low:
-                    picked = ph; break
+        if not picked and ph_rank:
+            words = s_low.split(" ")
+            best = None
+            for n in range(1, ph_maxn + 1):
+                for j in range(len(words) - n + 1):
+                    r = ph_rank.get(" ".join(words[j:j+n]))
+                    if r is not None and (best is None or r < best): best = r
+            if best is not None:
+                picked = phrase_pool[best]
         if not picked:
             toks = _tok4(s)
             if len(toks) >= 2: picked = f"{toks[-2]} {toks[-1]}"
@@ -1302,51 +1879,113 @@ def build_per_scene_queries(sentences: List[str], fallback_terms: List[str], top
             picked = topic_key_join
         if not picked or picked in ("great","nice","good","bad","things","stuff"):
             picked = "macro detail"
-        if len(picked.split()) > 2:
-            w = picked.split(); picked = f"{w[-2]} {w[-1]}"
+        w = picked.split()
+        if len(w) > 2:
+            picked = f"{w[-2]} {w[-1]}"
         queries.append(picked)
     return queries
 
 def _simplify_query(q: str, keep: int = 4) -> str:
     q = (q or "").lower()
-    q = re.sub(r"[^a-z0-9 ]+", " ", q)
+    q = _RE_NONALNUM_LC.sub(" ", q)
     toks = [t for t in q.split() if t and t not in _STOP]
     return " ".join(toks[:keep]) if toks else (q.strip()[:40] if q else "")
 
+_GENERIC_QUERIES = ("city timelapse","ocean waves","forest path","night skyline","macro detail","street crowd","mountain landscape")
+
 def _gen_topic_query_candidates(topic: str, terms: List[str]) -> List[str]:
-    out: List[str] = []
+    out: Dict[str, None] = {}  # sıralı tekil küme
     base = _simplify_query(topic, keep=4)
-    if base: out += [base, _simplify_query(base, keep=2)]
+    if base:
+        out[base] = None; out.setdefault(_simplify_query(base, keep=2), None)
     for t in (terms or []):
         tt = _simplify_query(t, keep=2)
-        if tt and tt not in out: out.append(tt)
+        if tt: out.setdefault(tt, None)
     if base:
-        for w in base.split():
-            if w not in out: out.append(w)
-    for g in ["city timelapse","ocean waves","forest path","night skyline","macro detail","street crowd","mountain landscape"]:
-        if g not in out: out.append(g)
-    return out[:20]
+        out.update(dict.fromkeys(base.split()))  # var olan anahtar yerinde kalır
+    out.update(dict.fromkeys(_GENERIC_QUERIES))
+    return list(out)[:20]
 
 # ==================== Pexels (robust) ====================
 _USED_PEXELS_IDS_RUNTIME: Set[int] = set()
 
+class _RateLimiter:
+    """Thread-safe minimum aralık sınırlayıcı: eşzamanlı işçiler API'ye en fazla rps istek/sn gönderir (429 yememek için).
+    Bekleme kilit dışında yapılır; her çağrı kendi zaman dilimini ayırıp o ana kadar uyur."""
+    def __init__(self, rps: float):
+        import threading
+        self.interval = (1.0 / rps) if rps > 0 else 0.0
+        self.next_ts = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if self.interval <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_ts)
+            self.next_ts = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_API_LIMITER = _RateLimiter(PEXELS_API_RPS)
+
 def _pexels_headers():
     if not PEXELS_API_KEY: raise RuntimeError("PEXELS_API_KEY missing")
     return {"Authorization": PEXELS_API_KEY}
 
 def _is_vertical_ok(w: int, h: int) -> bool:
     if VIDEO_W > VIDEO_H:
-        min_w = int(os.getenv("PEXELS_MIN_WIDTH", "1280"))
-        return (w >= h) and (w >= min_w)
+        return (w >= h) and (w >= _env_int("PEXELS_MIN_WIDTH", 1280))
     else:
         if PEXELS_STRICT_VERTICAL:
             return h > w and h >= PEXELS_MIN_HEIGHT
         return (h >= PEXELS_MIN_HEIGHT) and (h >= w or PEXELS_ALLOW_LANDSCAPE)
 
-def _pexels_search(query: str, locale: str, page: int = 1, per_page: int = None) -> List[Tuple[int, str, int, int, float]]:
+def _ttl_cache(ttl: float, maxsize: int = 512, disk_ttl: float = 0.0):
+    """Süreç içi TTL+LRU önbellek; sadece boş olmayan sonuçlar saklanır (429/5xx sonrası [] önbelleğe girmez).
+    disk_ttl > 0 ise satır-tuple sonuçları _DISK_CACHE'te de tutulur (çalıştırmalar arası).
+    store birden çok iş parçacığından (arama dalgaları, ön arama) kullanılır → erişimler kilitli; fn çağrısı kilit dışında."""
+    import threading
+    def deco(fn):
+        store: "OrderedDict[tuple, Tuple[float, tuple]]" = OrderedDict()
+        lock = threading.Lock()
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            key = args + tuple(sorted(kw.items()))
+            now = time.monotonic()
+            with lock:
+                hit = store.get(key)
+            if hit is not None and now - hit[0] < ttl:
+                return hit[1]
+            res = None
+            if disk_ttl > 0:
+                dk = _DiskCache.key(fn.__name__, *key)
+                cached = _DISK_CACHE.get(dk)
+                if cached:
+                    res = tuple(tuple(row) for row in cached)
+            if res is None:
+                res = tuple(fn(*args, **kw))
+                if res and disk_ttl > 0:
+                    _DISK_CACHE.set(dk, res, disk_ttl)
+            if res:
+                with lock:
+                    store[key] = (now, res); store.move_to_end(key)
+                    while len(store) > maxsize: store.popitem(last=False)
+            return res
+        def cache_clear():
+            with lock:
+                store.clear()
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return deco
+
+@_ttl_cache(PEXELS_CACHE_TTL, disk_ttl=PEXELS_DISK_CACHE_TTL)
+def _pexels_search(query: str, locale: str, page: int = 1, per_page: int = None) -> Tuple[Tuple[int, str, int, int, float], ...]:
     per_page = per_page or max(10, min(80, PEXELS_PER_PAGE))
     url = "https://api.pexels.com/videos/search"
-    r = requests.get(
+    _API_LIMITER.wait()
+    r = _HTTP.get(
         url, headers=_pexels_headers(),
         params={"query": query, "per_page": per_page, "page": page,
                 "orientation": PEXELS_ORIENT,"size":"large","locale": locale},
@@ -1371,9 +2010,11 @@ def _pexels_search(query: str, locale: str, page: int = 1, per_page: int = None)
         out.append((vid, link, w, h, dur))
     return out
 
-def _pexels_popular(locale: str, page: int = 1, per_page: int = 40) -> List[Tuple[int, str, int, int, float]]:
+@_ttl_cache(PEXELS_CACHE_TTL, disk_ttl=PEXELS_DISK_CACHE_TTL)
+def _pexels_popular(locale: str, page: int = 1, per_page: int = 40) -> Tuple[Tuple[int, str, int, int, float], ...]:
     url = "https://api.pexels.com/videos/popular"
-    r = requests.get(url, headers=_pexels_headers(), params={"per_page": per_page, "page": page}, timeout=30)
+    _API_LIMITER.wait()
+    r = _HTTP.get(url, headers=_pexels_headers(), params={"per_page": per_page, "page": page}, timeout=30)
     if r.status_code != 200:
         return []
     data = r.json() or {}
@@ -1399,7 +2040,8 @@ def _pixabay_fallback(q: str, need: int, locale: str) -> List[Tuple[int, str]]:
     try:
         params = {"key": PIXABAY_API_KEY, "q": q, "safesearch":"true",
                   "per_page": min(50, max(10, need*4)), "video_type":"film", "order":"popular"}
-        r = requests.get("https://pixabay.com/api/videos/", params=params, timeout=30)
+        _API_LIMITER.wait()
+        r = _HTTP.get("https://pixabay.com/api/videos/", params=params, timeout=30)
         if r.status_code != 200:
             return []
         data = r.json() or {}
@@ -1421,13 +2063,34 @@ def _pixabay_fallback(q: str, need: int, locale: str) -> List[Tuple[int, str]]:
     except Exception:
         return []
 
+def _stream_to_file(url: str, dst: str, timeout: int):
+    import shutil
+    with _HTTP.get(url, stream=True, timeout=timeout) as rr:
+        rr.raise_for_status()
+        rr.raw.decode_content = True  # gzip/deflate gelirse yine çözülmüş bayt yazılsın
+        with open(dst, "wb") as wfd:
+            shutil.copyfileobj(rr.raw, wfd, length=1 << 20)
+
+def _download_clip(link: str, dst: str) -> Optional[str]:
+    _stream_to_file(link, dst, timeout=120)
+    return dst if pathlib.Path(dst).stat().st_size > 300_000 else None
+
+# URL → token kümesi: [a-z0-9] dışındaki ASCII karakterler boşluğa; aynı link birden çok sorguda sıralanır → memo
+_ALNUM_TABLE = str.maketrans({chr(i): " " for i in range(128) if not (chr(i).isdigit() or "a" <= chr(i) <= "z")})
+
+@functools.lru_cache(maxsize=4096)
+def _link_tokens(link: str) -> frozenset:
+    low = link.lower()
+    if not low.isascii():
+        return frozenset(_RE_ALNUM.findall(low))
+    return frozenset(low.translate(_ALNUM_TABLE).split())
+
 def _rank_and_dedup(items: List[Tuple[int, str, int, int, float]], qtokens: Set[str], block: Set[int]) -> List[Tuple[int,str]]:
     cand=[]
     for vid, link, w, h, dur in items:
         if vid in block or vid in _USED_PEXELS_IDS_RUNTIME:
             continue
-        tokens = set(re.findall(r"[a-z0-9]+", (link or "").lower()))
-        overlap = len(tokens & qtokens)
+        overlap = len(_link_tokens(link or "") & qtokens) if qtokens else 0
         score = overlap*2.0 + (1.0 if 2.0 <= dur <= 12.0 else 0.0) + (1.0 if h >= 1440 else 0.0)
         cand.append((score, vid, link))
     cand.sort(key=lambda x: x[0], reverse=True)
@@ -1437,11 +2100,55 @@ def _rank_and_dedup(items: List[Tuple[int, str, int, int, float]], qtokens: Set[
         seen.add(vid); out.append((vid, link))
     return out
 
-def build_pexels_pool(topic: str, sentences: List[str], search_terms: List[str], need: int, rotation_seed: int = 0) -> List[Tuple[int,str]]:
-    random.seed(rotation_seed or int(time.time()))
-    locale = "tr-TR" if LANG.startswith("tr") else "en-US"
+def _assign_clips(vids: List[int], n: int, max_uses: int) -> List[int]:
+    """Sahnelere klip dağıt: havuz sırasıyla max_uses'a kadar, hepsi dolunca en az kullanılan (eşitlikte ilk sıradaki).
+    Min-heap anahtarı (dolu mu, kullanım, sıra) → sahne başına O(log N)."""
+    heap = [(0, 0, i) for i in range(len(vids))]  # sıralı liste zaten geçerli bir heap
+    use = [0] * len(vids)
+    out: List[int] = []
+    for _ in range(n if vids else 0):
+        _, _, i = heapq.heappop(heap)
+        use[i] += 1
+        out.append(vids[i])
+        heapq.heappush(heap, (0, 0, i) if use[i] < max_uses else (1, use[i], i))
+    return out
+
+def _pexels_locale() -> str:
+    return "tr-TR" if LANG.startswith("tr") else "en-US"
+
+_PREFETCH_FUTS: list = []  # (sorgu, future) — build_pexels_pool önbelleği okumadan önce bekler
+
+def _pexels_prefetch(topic: str, terms: List[str]) -> None:
+    """Spekülatif ön arama: Gemini yanıtı beklenirken konu/ENV terimlerinin 1. sayfaları arka planda çekilir.
+    Sonuçlar _pexels_search TTL önbelleğine düşer; build_pexels_pool aynı anahtarlarla ağa çıkmadan okur.
+    Kullanılmayanlar önbellekte kalıp süresi dolar."""
+    if not (PEXELS_PREFETCH and PEXELS_API_KEY):
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    locale = _pexels_locale()
+    qs = _gen_topic_query_candidates(topic, terms)[:PEXELS_SEARCH_WORKERS]
+    ex = ThreadPoolExecutor(max_workers=max(1, len(qs)))
+    _PREFETCH_FUTS.extend((q, ex.submit(_pexels_search, q, locale, page=1, per_page=PEXELS_PER_PAGE)) for q in qs)
+    ex.shutdown(wait=False)
+
+def _pexels_prefetch_join() -> None:
+    # Ön aramalar bitmeden aynı anahtarlar tekrar istenmesin; hatalar yutulmaz, bildirilir (havuz normal yoldan dener)
+    while _PREFETCH_FUTS:
+        q, fut = _PREFETCH_FUTS.pop()
+        try:
+            fut.result()
+        except Exception as e:
+            print(f"⚠️ Pexels prefetch fail ({q}): {str(e)[:160]}")
+
+def build_pexels_pool(topic: str, sentences: List[str], search_terms: List[str], need: int, rotation_seed: int = 0,
+                      per_scene: Optional[List[str]] = None) -> List[Tuple[int,str]]:
+    # Arka plan iş parçacığında çalışır → global random yeniden tohumlanmaz (ana iş parçacığının dizisini bozardı).
+    # Havuz kurulumu rastgele çekiliş yapmıyor; rotation_seed çağıran uyumluluğu için duruyor.
+    _pexels_prefetch_join()
+    locale = _pexels_locale()
     block = _blocklist_get_pexels()
-    per_scene = build_per_scene_queries(sentences, search_terms, topic=topic)
+    if per_scene is None:
+        per_scene = build_per_scene_queries(sentences, search_terms, topic=topic)
     topic_cands = _gen_topic_query_candidates(topic, search_terms)
     queries = []
     seen_q=set()
@@ -1450,23 +2157,37 @@ def build_pexels_pool(topic: str, sentences: List[str], search_terms: List[str],
         if q and q not in seen_q:
             seen_q.add(q); queries.append(q)
     pool: List[Tuple[int,str]] = []
-    qtokens_cache: Dict[str, Set[str]] = {}
-    for q in queries:
-        qtokens_cache[q] = set(re.findall(r"[a-z0-9]+", q.lower()))
-        merged: List[Tuple[int, str, int, int, float]] = []
+    in_pool: Set[int] = set()
+    quota = max(3, need//2)  # sorgu başına havuza girebilecek klip
+    qtokens = {q: set(_RE_ALNUM.findall(q.lower())) for q in queries}
+    merged: Dict[str, List[Tuple[int, str, int, int, float]]] = {q: [] for q in queries}
+    taken: Dict[str, int] = dict.fromkeys(queries, 0)
+
+    from concurrent.futures import ThreadPoolExecutor
+    # Sayfa öncelikli dolaşım: önce tüm sorguların 1. sayfası, havuz dolmadıysa 2. ve 3. sayfalar.
+    # İstekler dalga dalga eşzamanlı; havuz dolduğu anda kalan sorgu/sayfalar hiç istenmez.
+    with ThreadPoolExecutor(max_workers=PEXELS_SEARCH_WORKERS) as ex:
         for page in (1, 2, 3):
-            merged += _pexels_search(q, locale, page=page, per_page=PEXELS_PER_PAGE)
-            if len(merged) >= need*3: break
-        ranked = _rank_and_dedup(merged, qtokens_cache[q], block)
-        pool += ranked[:max(3, need//2)]
-        if len(pool) >= need*2: break
-    if len(pool) < need:
-        merged=[]
-        for page in (1,2,3):
-            merged += _pexels_popular(locale, page=page, per_page=40)
-            if len(merged) >= need*3: break
-        pop_rank = _rank_and_dedup(merged, set(), block)
-        pool += pop_rank[:need*2 - len(pool)]
+            todo = [q for q in queries if taken[q] < quota and len(merged[q]) < need*3]
+            for w0 in range(0, len(todo), PEXELS_SEARCH_WORKERS):
+                batch = todo[w0:w0+PEXELS_SEARCH_WORKERS]
+                futs = [ex.submit(_pexels_search, q, locale, page=page, per_page=PEXELS_PER_PAGE) for q in batch]
+                for q, f in zip(batch, futs):
+                    merged[q] += f.result()
+                    for vid, link in _rank_and_dedup(merged[q], qtokens[q], block):
+                        if taken[q] >= quota: break
+                        if vid in in_pool: continue
+                        in_pool.add(vid); pool.append((vid, link)); taken[q] += 1
+                    if len(pool) >= need*2: break
+                if len(pool) >= need*2: break
+            if len(pool) >= need*2: break
+        if len(pool) < need:
+            merged=[]
+            for f in [ex.submit(_pexels_popular, locale, page=page, per_page=40) for page in (1,2,3)]:
+                merged += f.result()
+                if len(merged) >= need*3: break
+            pop_rank = _rank_and_dedup(merged, set(), block)
+            pool += pop_rank[:need*2 - len(pool)]
     if len(pool) < need:
         fallback_q = (queries[-1] if queries else _simplify_query(topic, keep=1)) or "city"
         pix = _pixabay_fallback(fallback_q, need - len(pool), locale)
@@ -1483,9 +2204,9 @@ def build_pexels_pool(topic: str, sentences: List[str], search_terms: List[str],
 
 # ==================== YouTube ====================
 def yt_service():
-    cid  = os.getenv("YT_CLIENT_ID")
-    csec = os.getenv("YT_CLIENT_SECRET")
-    rtok = os.getenv("YT_REFRESH_TOKEN")
+    cid  = _ENV.get("YT_CLIENT_ID")
+    csec = _ENV.get("YT_CLIENT_SECRET")
+    rtok = _ENV.get("YT_REFRESH_TOKEN")
     if not (cid and csec and rtok):
         raise RuntimeError("Missing YT_CLIENT_ID / YT_CLIENT_SECRET / YT_REFRESH_TOKEN")
     creds = Credentials(
@@ -1528,14 +2249,12 @@ def build_long_description(channel: str, topic: str, sentences: List[str], tags:
         f"This longform explores “{topic}” with clear, visual beats so you can grasp it at a glance. "
         f"Rewatch to catch tiny details, save for later, and share with someone who’ll enjoy it."
     )
-    tagset = []
-    base_terms = [w for w in re.findall(r"[A-Za-z]{3,}", (topic or ""))][:5]
-    for t in base_terms: tagset.append("#" + t.lower())
-    tagset += ["#learn", "#visual", "#broll", "#education"]
-    if tags:
-        for t in tags[:10]:
-            tclean = re.sub(r"[^A-Za-z0-9]+","", t).lower()
-            if tclean and ("#"+tclean) not in tagset: tagset.append("#"+tclean)
+    tagset: Dict[str, None] = {}  # sıralı tekil hashtag kümesi
+    for t in _RE_LET3.findall(topic or "")[:5]: tagset["#" + t.lower()] = None
+    tagset.update(dict.fromkeys(("#learn", "#visual", "#broll", "#education")))
+    for t in (tags or [])[:10]:
+        tclean = _RE_NONALNUM_RUN.sub("", t).lower()
+        if tclean: tagset.setdefault("#" + tclean, None)
     body = (
         f"{explainer}\n\n— Chapters —\n"
         + "\n".join([f"{i+1:02d}: {(_derive_info_line(s))}" for i,s in enumerate(sentences[:20])]) +
@@ -1544,17 +2263,15 @@ def build_long_description(channel: str, topic: str, sentences: List[str], tags:
         + " ".join(tagset)
     )
     if len(body) > 4900: body = body[:4900]
-    yt_tags = []
-    for h in tagset:
-        k = h[1:]
-        if k and k not in yt_tags: yt_tags.append(k)
-        if len(yt_tags) >= 15: break
+    yt_tags = [h[1:] for h in tagset][:15]  # anahtarlar zaten tekil ve boş değil
     return title, body, yt_tags
 
 # ==================== HOOK/CTA cilası ====================
 HOOK_MAX_WORDS = _env_int("HOOK_MAX_WORDS", 10)
-CTA_STYLE      = os.getenv("CTA_STYLE", "soft_comment")
-LOOP_HINT      = os.getenv("LOOP_HINT", "1") == "1"
+CTA_STYLE      = _ENV.get("CTA_STYLE", "soft_comment")
+LOOP_HINT      = _ENV.get("LOOP_HINT", "1") == "1"
+
+_HOOK_QWORDS = frozenset({"why","how","did","are","is","can"})
 
 def _polish_hook_cta(sentences: List[str]) -> List[str]:
     if not sentences: return sentences
@@ -1562,89 +2279,100 @@ def _polish_hook_cta(sentences: List[str]) -> List[str]:
     hook = clean_caption_text(ss[0])
     words = hook.split()
     if len(words) > HOOK_MAX_WORDS:
-        hook = " ".join(words[:HOOK_MAX_WORDS])
-    if not re.search(r"[?!]$", hook):
-        if hook.split()[0:1] and hook.split()[0].lower() not in {"why","how","did","are","is","can"}:
-            hook = hook.rstrip(".") + "?"
+        words = words[:HOOK_MAX_WORDS]
+        hook = " ".join(words)
+    first = words[0].lower() if words else ""
+    if first and first not in _HOOK_QWORDS and not _RE_END_QEX.search(hook):
+        hook = hook.rstrip(".") + "?"
     ss[0] = hook
-    if ss and not re.search(r'[.!?]$', ss[-1].strip()):
+    if ss and not _RE_ENDPUNCT.search(ss[-1].strip()):
         ss[-1] = ss[-1].strip() + '.'
     return ss
 
 # ==================== BGM helpers ====================
 def _pick_bgm_source(tmpdir: str) -> Optional[str]:
+    # kendi RNG'si: Pexels havuzu paralel kurulurken global random'a bağlı kalmadan ROTATION_SEED ile tekrarlanabilir seçim
+    rng = random.Random(ROTATION_SEED or int(time.time()))
     try:
         p = pathlib.Path(BGM_DIR)
         if p.exists():
             files = [str(x) for x in p.glob("*.mp3")] + [str(x) for x in p.glob("*.wav")]
             if files:
-                random.shuffle(files)
+                rng.shuffle(files)
                 return files[0]
     except Exception:
         pass
-    urls = list(BGM_URLS or [])
-    random.shuffle(urls)
-    for u in urls:
+    import shutil, hashlib
+    srcs = list(_BGM_SOURCES)
+    rng.shuffle(srcs)
+    cache_dir = pathlib.Path(CACHE_DIR) / "bgm_src"
+    for u, ext in srcs:
         try:
-            ext = ".mp3" if ".mp3" in u.lower() else ".wav"
+            cached = cache_dir / f"{hashlib.sha1(u.encode('utf-8')).hexdigest()[:16]}{ext}"
+            if cached.exists() and cached.stat().st_size > 100_000:
+                return str(cached)  # önceki çalıştırmada indirildi
             outp = str(pathlib.Path(tmpdir) / f"bgm_src{ext}")
-            with requests.get(u, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(outp, "wb") as f:
-                    for ch in r.iter_content(8192): f.write(ch)
+            _stream_to_file(u, outp, timeout=60)
             if pathlib.Path(outp).stat().st_size > 100_000:
+                try:
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(outp, str(cached) + ".tmp"); os.replace(str(cached) + ".tmp", cached)
+                except Exception:
+                    pass
                 return outp
         except Exception:
             continue
     return None
 
-def _make_bgm_looped(src: str, dur: float, out_wav: str):
-    fade = max(0.3, float(BGM_FADE))
-    endst = max(0.0, dur - fade)
-    run([
-        "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-stream_loop","-1","-i", src,
-        "-t", f"{dur:.3f}",
-        "-af", f"loudnorm=I=-21:TP=-2.0:LRA=11,"
-               f"afade=t=in:st=0:d={fade:.2f},afade=t=out:st={endst:.2f}:d={fade:.2f},"
-               "aresample=48000,pan=mono|c0=0.5*FL+0.5*FR",
-        "-ar","48000","-ac","1","-c:a","pcm_s16le",
-        out_wav
-    ])
-
-def _duck_and_mix(voice_in: str, bgm_in: str, outp: str):
-    bgm_gain_db   = float(os.getenv("BGM_GAIN_DB", "-10"))
-    thr           = float(os.getenv("BGM_DUCK_THRESH", "0.03"))
-    ratio         = float(os.getenv("BGM_DUCK_RATIO",  "10"))
-    attack_ms     = int(os.getenv("BGM_DUCK_ATTACK_MS","6"))
-    release_ms    = int(os.getenv("BGM_DUCK_RELEASE_MS","180"))
+def _bgm_normalized(src: str) -> str:
+    """BGM kaynağı statik → loudnorm + 48k mono dönüşümü içerik özetine göre CACHE_DIR/bgm altında bir kez yapılır."""
+    import hashlib
+    h = hashlib.blake2b(digest_size=8)
+    with open(src, "rb") as f:
+        for ch in iter(lambda: f.read(1 << 20), b""): h.update(ch)
+    cache_dir = pathlib.Path(CACHE_DIR) / "bgm"
+    norm = cache_dir / f"{h.hexdigest()}.wav"
+    if norm.exists():
+        return str(norm)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_out = str(norm.with_suffix(f".{os.getpid()}.tmp.wav"))
+    try:
+        run_fast([
+            "ffmpeg","-y","-hide_banner","-loglevel","error",
+            "-i", src,
+            "-af", "loudnorm=I=-21:TP=-2.0:LRA=11,aresample=48000,pan=mono|c0=0.5*FL+0.5*FR",
+            "-ar","48000","-ac","1","-c:a","pcm_s16le",
+            tmp_out
+        ])
+        os.replace(tmp_out, norm)
+    finally:
+        pathlib.Path(tmp_out).unlink(missing_ok=True)
+    return str(norm)
+
+def _duck_graph(voice: str, bgm: str) -> str:
+    """Ses + BGM → sidechain ducking + amix + limiter filtre zinciri (çıkış etiketi çağırana bırakılır)."""
+    bgm_gain_db   = _env_float("BGM_GAIN_DB", -10.0)
+    thr           = _env_float("BGM_DUCK_THRESH", 0.03)
+    ratio         = _env_float("BGM_DUCK_RATIO", 10.0)
+    attack_ms     = _env_int("BGM_DUCK_ATTACK_MS", 6)
+    release_ms    = _env_int("BGM_DUCK_RELEASE_MS", 180)
     sc = (f"sidechaincompress=threshold={thr}:ratio={ratio}:attack={attack_ms}:release={release_ms}:"
           f"makeup=1.0:level_in=1.0:level_sc=1.0")
     if _HAS_SIDECHAIN:
-        filter_complex = (
-            f"[1:a]volume={bgm_gain_db}dB[b];"
-            f"[b][0:a]{sc}[duck];"
-            f"[0:a][duck]amix=inputs=2:duration=shortest,aresample=48000,alimiter=limit=0.98[mix]"
-        )
-    else:
-        filter_complex = (
-            f"[1:a]volume={bgm_gain_db}dB[b];"
-            f"[0:a][b]amix=inputs=2:duration=shortest,aresample=48000,alimiter=limit=0.98[mix]"
+        return (
+            f"{bgm}volume={bgm_gain_db}dB[b];"
+            f"[b]{voice}{sc}[duck];"
+            f"{voice}[duck]amix=inputs=2:duration=shortest,aresample=48000,alimiter=limit=0.98"
         )
-    run([
-        "ffmpeg","-y","-hide_banner","-loglevel","error",
-        "-i", voice_in, "-i", bgm_in,
-        "-filter_complex", filter_complex,
-        "-map","[mix]",
-        "-ar","48000","-ac","1",
-        "-c:a","pcm_s16le",
-        outp
-    ])
+    return (
+        f"{bgm}volume={bgm_gain_db}dB[b];"
+        f"{voice}[b]amix=inputs=2:duration=shortest,aresample=48000,alimiter=limit=0.98"
+    )
 
 # ==================== Debug meta ====================
 def _dump_debug_meta(path: str, obj: dict):
     try:
-        pathlib.Path(path).write_text(json.dumps(obj, indent=2, ensure_ascii=False), encoding="utf-8")
+        pathlib.Path(path).write_bytes(_json_dumps(obj, pretty=True))
     except Exception:
         pass
 
@@ -1657,8 +2385,9 @@ def main():
         else: print(msg + " (devam edilecek)")
 
     random.seed(ROTATION_SEED or int(time.time()))
-    topic_lock = TOPIC or "Interesting Visual Explainers"
-    user_terms = SEARCH_TERMS_ENV
+    topic_lock = _topic() or "Interesting Visual Explainers"
+    user_terms = list(_search_terms_env())
+    _pexels_prefetch(topic_lock, user_terms)
 
     # 1) İçerik üretim + kalite + NOVELTY
     attempts = 0
@@ -1670,11 +2399,11 @@ def main():
         attempts += 1
         if USE_GEMINI and GEMINI_API_KEY:
             try:
-                tpc, sents, search_terms, ttl, desc, tags = build_via_gemini(CHANNEL_NAME, topic_lock, user_terms, banlist)
+                tpc, sents, search_terms, ttl, desc, tags, scene_q = build_via_gemini(CHANNEL_NAME, topic_lock, user_terms, banlist)
             except Exception as e:
                 print(f"Gemini error: {str(e)[:200]}")
                 tpc = topic_lock; sents=[]; search_terms=user_terms or []
-                ttl = ""; desc = ""; tags=[]
+                ttl = ""; desc = ""; tags=[]; scene_q=[]
         else:
             tpc = topic_lock
             sents = [
@@ -1688,7 +2417,7 @@ def main():
                 "What would you add? Tell me below."
             ]
             search_terms = _terms_normalize(user_terms or ["macro detail","timelapse","clean b-roll"])
-            ttl = ""; desc=""; tags=[]
+            ttl = ""; desc=""; tags=[]; scene_q=[]
         sents = _polish_hook_cta(sents)
 
         ok, avoid_terms = _novelty_ok(sents)
@@ -1700,7 +2429,7 @@ def main():
         if ENTITY_COOLDOWN_DAYS > 0:
             ent = _derive_focus_entity(tpc, MODE, sents)
             ek = _entity_key(MODE, ent)
-            if ent and _entity_in_cooldown(ek, ENTITY_COOLDOWN_DAYS):
+            if ent and _entity_in_cooldown(ek):
                 novelty_tries += 1
                 print(f"⚠️ Focus entity in cooldown: '{ent}' → rebuilding… ({novelty_tries}/{NOVELTY_RETRIES})")
                 banlist = [ent] + banlist; continue
@@ -1708,7 +2437,7 @@ def main():
         score = _content_score(sents)
         print(f"📝 Content: {tpc} | {len(sents)} scenes | score={score:.2f}")
         if score > best_score:
-            best = (tpc, sents, search_terms, ttl, desc, tags)
+            best = (tpc, sents, search_terms, ttl, desc, tags, scene_q)
             best_score = score
         if score >= 7.2 and ok:
             break
@@ -1717,30 +2446,45 @@ def main():
             banlist = [tpc] + banlist
             time.sleep(0.3)
 
-    tpc, sentences, search_terms, ttl, desc, tags = best
+    tpc, sentences, search_terms, ttl, desc, tags, scene_q = best
     sig = f"{CHANNEL_NAME}|{tpc}|{sentences[0] if sentences else ''}"
-    fp = sorted(list(_sentences_fp(sentences)))[:500]
-    _record_recent(_hash12(sig), MODE, tpc, fp=fp)
+    cur_fp = _sentences_fp(sentences)
+    fp = sorted(list(cur_fp))[:500]
+    _record_recent(_hash12(sig), MODE, tpc, fp=fp, mh=(_sketch_encode(_fp_sketch(cur_fp)) if cur_fp else None))
     try:
         __ent = _derive_focus_entity(tpc, MODE, sentences); __ek = _entity_key(MODE, __ent); _entity_touch(__ek)
     except Exception:
         pass
 
-    _dump_debug_meta(f"{OUT_DIR}/meta_{re.sub(r'[^A-Za-z0-9]+','_',CHANNEL_NAME)}.json", {
+    _dump_debug_meta(f"{OUT_DIR}/meta_{_RE_NONALNUM_RUN.sub('_',CHANNEL_NAME)}.json", {
         "channel": CHANNEL_NAME, "topic": tpc, "sentences": sentences, "search_terms": search_terms,
         "lang": LANG, "model": GEMINI_MODEL, "ts": time.time()
     })
     print(f"📊 Sentences: {len(sentences)}")
 
     # 2) TTS (kelime zamanları ile)
+    import tempfile, shutil
     tmp = tempfile.mkdtemp(prefix="enhanced_shorts_")
     font = font_path()
     wavs, metas = [], []
     print("🎤 TTS…")
-    for i, s in enumerate(sentences):
-        base = normalize_sentence(s)
-        w = str(pathlib.Path(tmp) / f"sent_{i:02d}.wav")
-        d, words = tts_to_wav(base, w)
+    bases = [normalize_sentence(s) for s in sentences]
+
+    # Pexels havuzu TTS ile eşzamanlı hazırlanır (sadece ağ I/O; sahne metinleri TTS'ten önce belli).
+    # Ek sahne istenirse metinler değişir → aşağıda yeniden kurulur (aramalar TTL önbellekten döner).
+    default_scenes = "9" if LONGFORM else "8"
+    need_clips = max(6, min(16, _env_int("SCENE_COUNT", int(default_scenes))))
+    pool_kw = dict(topic=tpc, search_terms=(search_terms or user_terms or []), need=need_clips, rotation_seed=ROTATION_SEED)
+    from concurrent.futures import ThreadPoolExecutor
+    pool_ex = ThreadPoolExecutor(max_workers=1)
+    spec_bases = list(bases)
+    spec_queries = (scene_q if len(scene_q) == len(spec_bases) else
+                    build_per_scene_queries(spec_bases, pool_kw["search_terms"], topic=tpc))
+    pool_fut = pool_ex.submit(build_pexels_pool, sentences=spec_bases, per_scene=spec_queries, **pool_kw)
+    pool_ex.shutdown(wait=False)
+
+    ws = [str(pathlib.Path(tmp) / f"sent_{i:02d}.wav") for i in range(len(bases))]
+    for i, (base, w, (d, words)) in enumerate(zip(bases, ws, tts_batch(bases, ws))):
         wavs.append(w); metas.append((base, d, words))
         print(f"   {i+1}/{len(sentences)}: {d:.2f}s")
 
@@ -1750,139 +2494,140 @@ def main():
         need = TARGET_MIN_SEC - total_audio
         print(f"⏫ TTS total {total_audio:.1f}s < {TARGET_MIN_SEC:.0f}s → requesting extra scenes (~{need:.0f}s)…")
         extra = gen_extra_scenes(tpc, need)
-        for j, s in enumerate(extra):
-            base = normalize_sentence(s)
-            w = str(pathlib.Path(tmp) / f"sent_extra_{j:02d}.wav")
-            d, words = tts_to_wav(base, w)
+        bases = [normalize_sentence(s) for s in extra]
+        ws = [str(pathlib.Path(tmp) / f"sent_extra_{j:02d}.wav") for j in range(len(bases))]
+        for j, (base, w, (d, words)) in enumerate(zip(bases, ws, tts_batch(bases, ws))):
             wavs.append(w); metas.append((base, d, words))
             print(f"   extra {j+1}/{len(extra)}: {d:.2f}s")
         total_audio = sum(d for _,d,_ in metas)
         print(f"✅ New TTS total: {total_audio:.1f}s")
 
-    # 3) Pexels — per-scene terms
-    per_scene_queries = build_per_scene_queries([m[0] for m in metas], (search_terms or user_terms or []), topic=tpc)
+    # 3) Pexels — per-scene terms (Gemini verdiyse onun sorguları)
+    scene_texts = [m[0] for m in metas]
+    spec_ok = (scene_texts == spec_bases)
+    per_scene_queries = spec_queries if spec_ok else build_per_scene_queries(scene_texts, pool_kw["search_terms"], topic=tpc)
     print("🔎 Per-scene queries:")
     for q in per_scene_queries: print(f"   • {q}")
 
-    default_scenes = "9" if LONGFORM else "8"
-    need_clips = max(6, min(16, int(os.getenv("SCENE_COUNT", default_scenes))))
-    pool: List[Tuple[int,str]] = build_pexels_pool(
-        topic=tpc,
-        sentences=[m[0] for m in metas],
-        search_terms=(search_terms or user_terms or []),
-        need=need_clips,
-        rotation_seed=ROTATION_SEED
-    )
+    if spec_ok:
+        pool: List[Tuple[int,str]] = pool_fut.result()
+    else:
+        pool_fut.exception()  # spekülatif kurulumun bitmesini bekle (hata önemsiz)
+        pool = build_pexels_pool(sentences=scene_texts, per_scene=per_scene_queries, **pool_kw)
     if not pool: raise RuntimeError("Pexels: no suitable clips (after all fallbacks).")
 
-    # 4) İndir ve dağıt
+    # 4) İndir ve dağıt (eşzamanlı; sonuçlar havuz sırasıyla toplanır)
     downloads: Dict[int,str] = {}
     print("⬇️ Download pool…")
-    for idx, (vid, link) in enumerate(pool):
-        try:
-            f = str(pathlib.Path(tmp) / f"pool_{idx:02d}_{vid}.mp4")
-            with requests.get(link, stream=True, timeout=120) as rr:
-                rr.raise_for_status()
-                with open(f, "wb") as wfd:
-                    for ch in rr.iter_content(8192): wfd.write(ch)
-            if pathlib.Path(f).stat().st_size > 300_000:
-                downloads[vid] = f
-        except Exception as e:
-            print(f"⚠️ download fail ({vid}): {e}")
+    with ThreadPoolExecutor(max_workers=max(1, min(len(pool), PEXELS_DOWNLOAD_WORKERS))) as ex:
+        futs = [(vid, ex.submit(_download_clip, link, str(pathlib.Path(tmp) / f"pool_{idx:02d}_{vid}.mp4")))
+                for idx, (vid, link) in enumerate(pool)]
+        for vid, fut in futs:
+            try:
+                f = fut.result()
+                if f: downloads[vid] = f
+            except Exception as e:
+                print(f"⚠️ download fail ({vid}): {e}")
     if not downloads: raise RuntimeError("Pexels pool empty after downloads.")
     print(f"   Downloaded unique clips: {len(downloads)}")
 
-    usage = {vid:0 for vid in downloads.keys()}
-    chosen_files: List[str] = []; chosen_ids: List[int] = []
-    if not PEXELS_ALLOW_REUSE:
-        ordered = list(downloads.items())[:len(metas)]
-        for i in range(len(metas)):
-            if i < len(ordered):
-                vid, pathv = ordered[i]
-            else:
-                vid = min(usage.keys(), key=lambda k: usage[k]); pathv = downloads[vid]
-            usage[vid] += 1
-            chosen_files.append(pathv); chosen_ids.append(vid); _USED_PEXELS_IDS_RUNTIME.add(vid)
-    else:
-        for i in range(len(metas)):
-            picked_vid = None
-            for vid in list(usage.keys()):
-                if usage[vid] < PEXELS_MAX_USES_PER_CLIP:
-                    picked_vid = vid; break
-            if picked_vid is None:
-                picked_vid = min(usage.keys(), key=lambda k: usage[k])
-            usage[picked_vid] += 1
-            chosen_files.append(downloads[picked_vid]); chosen_ids.append(picked_vid); _USED_PEXELS_IDS_RUNTIME.add(picked_vid)
+    chosen_ids: List[int] = _assign_clips(list(downloads.keys()), len(metas),
+                                          PEXELS_MAX_USES_PER_CLIP if PEXELS_ALLOW_REUSE else 1)
+    chosen_files: List[str] = [downloads[vid] for vid in chosen_ids]
+    _USED_PEXELS_IDS_RUNTIME.update(chosen_ids)
 
     # 5) Segment + bilgi kartı overlay
-    print("🎬 Segments…")
-    segs = []
-    for i, ((base_text, d, words), src) in enumerate(zip(metas, chosen_files)):
-        base   = str(pathlib.Path(tmp) / f"seg_{i:02d}.mp4")
-        make_segment(src, d, base)
+    def _build_scene(i: int, meta: Tuple[str, float, list], src: str) -> str:
+        base_text, d, words = meta
         colored = str(pathlib.Path(tmp) / f"segsub_{i:02d}.mp4")
+        color = CAPTION_COLORS[i % len(CAPTION_COLORS)]
+        # bilgi kartı varsa segment + yazı tek libx264 geçişi
+        cap_tf = str(pathlib.Path(tmp) / f"segsub_{i:02d}.caption.txt")
+        overlay = _info_overlay_vf(base_text, color, font, quantize_to_frames(d, TARGET_FPS)[1], cap_tf, is_hook=(i == 0))
+        if overlay:
+            try:
+                make_segment(src, d, colored, threads=seg_threads, overlay=overlay)
+            finally:
+                pathlib.Path(cap_tf).unlink(missing_ok=True)
+            return colored
+        base   = str(pathlib.Path(tmp) / f"seg_{i:02d}.mp4")
+        make_segment(src, d, base, threads=seg_threads)
+        intra_segs.add(i)  # yazısız → ara all-intra dosya olduğu gibi kopyalanır
         draw_capcut_text(
             base,
             base_text,
-            CAPTION_COLORS[i % len(CAPTION_COLORS)],
+            color,
             font,
             colored,
             is_hook=(i == 0),
-            words=words
+            words=words,
+            threads=seg_threads
         )
-        segs.append(colored)
+        return colored
+
+    # sahneler birbirinden bağımsız → ffmpeg süreçleri paralel (GIL subprocess'te serbest)
+    from concurrent.futures import ThreadPoolExecutor
+    intra_segs: Set[int] = set()
+    n_workers = max(1, min(len(metas), SEGMENT_WORKERS))
+    # sahne sayısı işçi sayısından azsa boşta kalan çekirdekler çalışan encode'lara dağıtılır
+    seg_threads = max(SEGMENT_THREADS, _CPU_COUNT // n_workers)
+    print(f"🎬 Segments… ({n_workers} worker × {seg_threads} thread)")
+    with ThreadPoolExecutor(max_workers=n_workers) as ex:
+        segs = list(ex.map(_build_scene, range(len(metas)), metas, chosen_files))
 
     # 6) Birleştir
     print("🎞️ Assemble…")
-    vcat = str(pathlib.Path(tmp) / "video_concat.mp4"); concat_videos_filter(segs, vcat)
+    vcat = str(pathlib.Path(tmp) / "video_concat.mp4")
+    # kopya-birleştirme imzaların hepsi aynıysa olur → ara dosya varsa vcat da superfast all-intra'dır
+    vcat_intra = concat_videos_filter(segs, vcat) and bool(intra_segs)
     acat = str(pathlib.Path(tmp) / "audio_concat.wav"); concat_audios(wavs, acat)
 
     # 7) Süre & kare kilitleme (video = audio)
     adur = ffprobe_dur(acat); vdur = ffprobe_dur(vcat)
-    if vdur + 0.02 < adur:
-        vcat_padded = str(pathlib.Path(tmp) / "video_padded.mp4")
-        pad_video_to_duration(vcat, adur, vcat_padded); vcat = vcat_padded
+    pad_sec = (adur - vdur) if vdur + 0.02 < adur else 0.0  # kısa video: pad, kare kilitleme encode'una katılır
     a_frames = max(2, int(round(adur * TARGET_FPS)))
-    vcat_exact = str(pathlib.Path(tmp) / "video_exact.mp4"); enforce_video_exact_frames(vcat, a_frames, vcat_exact); vcat = vcat_exact
-    acat_exact = str(pathlib.Path(tmp) / "audio_exact.wav"); lock_audio_duration(acat, a_frames, acat_exact); acat = acat_exact
-    vdur2 = ffprobe_dur(vcat); adur2 = ffprobe_dur(acat)
-    print(f"🔒 Locked A/V: video={vdur2:.3f}s | audio={adur2:.3f}s | fps={TARGET_FPS}")
 
-    # 7.1) CTA (kuçuk overlay)
-    cta_text = ""
+    # 7.1) CTA (kuçuk overlay) — kare kilitleme encode'una katılır (ayrı tam-video encode'u yok)
+    cta_text = ""; cta_vf = ""
+    cta_tf = str(pathlib.Path(tmp) / "video_cta.txt")
     try:
         if CTA_ENABLE:
             cta_text = build_contextual_cta(tpc, [m[0] for m in metas], LANG)
             if cta_text:
                 print(f"💬 CTA: {cta_text}")
-                vcat_cta = str(pathlib.Path(tmp) / "video_cta.mp4")
-                overlay_cta_tail(vcat, cta_text, vcat_cta, CTA_SHOW_SEC, font)
-                vcat_exact2 = str(pathlib.Path(tmp) / "video_exact_cta.mp4")
-                enforce_video_exact_frames(vcat_cta, a_frames, vcat_exact2)
-                vcat = vcat_exact2
+                cta_vf = _cta_tail_vf(cta_text, a_frames / float(TARGET_FPS), CTA_SHOW_SEC, font, cta_tf)
+    except Exception as e:
+        print(f"⚠️ CTA overlay skipped: {e}")
+
+    vcat_exact = str(pathlib.Path(tmp) / "video_exact.mp4")
+    try:
+        enforce_video_exact_frames(vcat, a_frames, vcat_exact, pad_sec=pad_sec, post_vf=cta_vf, intermediate=vcat_intra)
     except Exception as e:
+        if not cta_vf: raise
         print(f"⚠️ CTA overlay skipped: {e}")
+        enforce_video_exact_frames(vcat, a_frames, vcat_exact, pad_sec=pad_sec, intermediate=vcat_intra)
+    finally:
+        pathlib.Path(cta_tf).unlink(missing_ok=True)
+    vcat = vcat_exact
+    acat_exact = str(pathlib.Path(tmp) / "audio_exact.wav"); lock_audio_duration(acat, a_frames, acat_exact); acat = acat_exact
+    vdur2 = ffprobe_dur(vcat); adur2 = ffprobe_dur(acat)
+    print(f"🔒 Locked A/V: video={vdur2:.3f}s | audio={adur2:.3f}s | fps={TARGET_FPS}")
 
-    # 7.5) BGM mix (opsiyonel)
+    # 7.5) BGM (opsiyonel) — döngü/ducking/süre kilidi mux adımında tek ffmpeg geçişiyle yapılır
+    bgm_norm = None
     if BGM_ENABLE:
         bgm_src = _pick_bgm_source(tmp)
         if bgm_src:
             print("🎧 BGM: mixing with sidechain ducking…")
-            bgm_loop = str(pathlib.Path(tmp) / "bgm_loop.wav")
-            _make_bgm_looped(bgm_src, adur2, bgm_loop)
-            a_mix = str(pathlib.Path(tmp) / "audio_with_bgm.wav")
-            _duck_and_mix(acat, bgm_loop, a_mix)
-            a_mix_exact = str(pathlib.Path(tmp) / "audio_with_bgm_exact.wav")
-            lock_audio_duration(a_mix, max(2, int(round(adur2 * TARGET_FPS))), a_mix_exact)
-            acat = a_mix_exact
+            bgm_norm = _bgm_normalized(bgm_src)
         else:
             print("🎧 BGM: kaynak bulunamadı (BGM_DIR veya BGM_URLS).")
 
     # 8) Mux
-    ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    safe_topic = re.sub(r'[^A-Za-z0-9]+', '_', tpc)[:60] or "Longform"
+    ts = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+    safe_topic = _RE_NONALNUM_RUN.sub('_', tpc)[:60] or "Longform"
     outp = f"{OUT_DIR}/{CHANNEL_NAME}_{safe_topic}_{ts}.mp4"
-    print("🔄 Mux…"); mux(vcat, acat, outp)
+    print("🔄 Mux…"); mux(vcat, acat, outp, bgm=bgm_norm, frames=max(2, int(round(adur2 * TARGET_FPS))))
     final = ffprobe_dur(outp); print(f"✅ Saved: {outp} ({final:.2f}s)")
 
     # 9) Metadata (long SEO)
@@ -1892,7 +2637,7 @@ def main():
 
     # 10) Upload (varsa env)
     try:
-        if os.getenv("UPLOAD_TO_YT","1") == "1":
+        if _ENV.get("UPLOAD_TO_YT","1") == "1":
             print("📤 Uploading to YouTube…")
             vid_id = upload_youtube(outp, meta)
             print(f"🎉 YouTube Video ID: {vid_id}\n🔗 https://youtube.com/watch?v={vid_id}")
@@ -1908,7 +2653,8 @@ def main():
         print(f"⚠️ Blocklist save warn: {e}")
 
     # 12) Temizlik
-    try: shutil.rmtree(tmp); print("🧹 Cleaned temp files")
+    try: _fast_rmtree(tmp); print("🧹 Cleaned temp files")
+    except OSError: shutil.rmtree(tmp, ignore_errors=True)
     except: pass
 
 if __name__ == "__main__":